@@ -5,6 +5,13 @@ interface Message {
   role: 'user' | 'assistant';
 }
 
+type StreamEvent =
+  | { type: 'content'; token: string }
+  | { type: 'tool_start'; id: string; name: string; args: unknown }
+  | { type: 'tool_end'; id: string; name: string; status: string }
+  | { type: 'done' }
+  | { type: 'error'; message: string };
+
 function initHandler() {
   document.removeEventListener('DOMContentLoaded', initHandler);
 
@@ -13,6 +20,9 @@ function initHandler() {
   const clearButton = document.getElementById('clearButton') as HTMLButtonElement; // New clear button
   const chatContainer = document.getElementById('chatContainer') as HTMLDivElement;
 
+  // Identifies this window's conversation to the backend
+  const sessionId = crypto.randomUUID();
+
   let isProcessing = false;
   let currentAssistantMessage: HTMLDivElement | null = null;
 
@@ -39,6 +49,7 @@ function initHandler() {
       addMessage(message, true);
 
       const requestBody = JSON.stringify({
+        session_id: sessionId,
         message: {
           text: message,
           role: 'user'
@@ -59,6 +70,37 @@ function initHandler() {
 
       currentAssistantMessage = addMessage('', false);
       let assistantResponse = '';
+      const runningTools = new Map<string, string>();
+
+      // Each line is one event: content tokens, tool progress, or the end of the reply
+      const handleFrame = (line: string) => {
+        if (!line.trim()) return;
+        let event: StreamEvent;
+        try {
+          event = JSON.parse(line);
+        } catch (e) {
+          console.error('Error parsing JSON:', e);
+          return;
+        }
+        if (!currentAssistantMessage) return;
+
+        switch (event.type) {
+          case 'content':
+            assistantResponse += event.token;
+            break;
+          case 'tool_start':
+            runningTools.set(event.id, event.name);
+            break;
+          case 'tool_end':
+            runningTools.delete(event.id);
+            break;
+          case 'error':
+            assistantResponse += `\n[Error: ${event.message}]`;
+            break;
+        }
+        const status = runningTools.size ? `\n(${[...runningTools.values()].join(', ')}...)` : '';
+        currentAssistantMessage.textContent = assistantResponse + status;
+      };
 
       const reader = response.body?.getReader();
       const decoder = new TextDecoder();
@@ -77,31 +119,11 @@ function initHandler() {
         buffer = lines.pop() || '';
 
         for (const line of lines) {
-          if (line.trim()) {
-            try {
-              const { token } = JSON.parse(line);
-              if (currentAssistantMessage) {
-                currentAssistantMessage.textContent += token;
-                assistantResponse += token;
-              }
-            } catch (e) {
-              console.error('Error parsing JSON:', e);
-            }
-          }
+          handleFrame(line);
         }
       }
 
-      if (buffer.trim()) {
-        try {
-          const { token } = JSON.parse(buffer);
-          if (currentAssistantMessage) {
-            currentAssistantMessage.textContent += token;
-            assistantResponse += token;
-          }
-        } catch (e) {
-          console.error('Error parsing JSON:', e);
-        }
-      }
+      handleFrame(buffer);
     } catch (error) {
       console.error('Error:', error);
       if (currentAssistantMessage) {
@@ -121,7 +143,7 @@ function initHandler() {
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify({ clear: true }),
+        body: JSON.stringify({ session_id: sessionId, clear: true }),
       });
   
       if (!response.ok) {
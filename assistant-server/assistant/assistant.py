@@ -1,42 +1,54 @@
 import os
+import asyncio
 from langchain.chat_models import init_chat_model
-from langchain_mcp_adapters.client import MultiServerMCPClient
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, ToolMessage
 from config import OPENAI_API_KEY
-import json
+from context import ContextWindow
+from mcp_connections import MCPConnectionManager
+from metrics import TurnTrace
+from streaming import FrameCoalescer, StreamAccumulator, frame, with_deadlines
+from tool_cache import BUDGET_WRITE_TOOLS, CachedTool, ToolResultCache
+import logging
+import time
 from datetime import datetime
 
 system_message = SystemMessage(
     f"Today is {datetime.today().strftime('%d-%m-%Y')}. You are an AI personal assistant. You help the USER with general tasks like getting weather data, checking their calendar, etc. You must be formal and polite when addressing the USER. When answering a question, you must give accurate data you obtained from the tools at your disposal; you mustn't make up information yousrself. When listing the USER's events you MUST start with a new line, and list the events off one by one in a numbered list with a new line after each listing. Each event should have a name and a start and end date, and possibly times. When including those parameters, make sure to only print them if they exist! If you don't have the data, simply don't print anything.")
 
+logger = logging.getLogger("assistant")
+
+# Tool calls from one model step run concurrently, up to this many at a time
+TOOL_CONCURRENCY = int(os.environ.get("ASSISTANT_TOOL_CONCURRENCY", "4"))
+# Seconds before a single read-only tool call is abandoned and reported to the model as an error
+TOOL_TIMEOUT = float(os.environ.get("ASSISTANT_TOOL_TIMEOUT", "30"))
+# The same for tools that change state. Much longer, since a big import is legitimately slow and an
+# abandoned write may still commit, so a timeout can only be reported as an unknown outcome.
+WRITE_TOOL_TIMEOUT = float(os.environ.get("ASSISTANT_WRITE_TOOL_TIMEOUT", "600"))
+# Tools that change state. Servers can also flag them with readOnlyHint=False, which adapters expose as metadata.
+MUTATING_TOOLS = BUDGET_WRITE_TOOLS
+
+# Shared by every session, since they all talk to the same MCP servers
+tool_cache = ToolResultCache()
+
 async def init_model():
 
-    print("initializing model")
+    logger.info("initializing model")
 
     if not os.environ.get("OPENAI_API_KEY"):
         os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
 
     model = init_chat_model("gpt-4o-mini", model_provider="openai")
 
-    # Create client without using context manager
-    client = MultiServerMCPClient({
-        "Budget": {
-            "url": "http://localhost:8000/sse",
-            "transport": "sse",
-        }
-    })
-
-    await client.__aenter__()
-    
-    # Get tools
-    tools = client.get_tools()
+    # Connect to every configured MCP server; the tools are bound per request, see MCPConnectionManager.bind
+    connections = MCPConnectionManager(wrap_tool=lambda tool: CachedTool(tool, tool_cache))
+    await connections.start()
 
-    return (model.bind_tools(tools), {tools[i].name: tools[i] for i in range(0, len(tools))}, client)
+    return (model, connections)
 
 def init_messages():
     return [system_message]
 
-def send_message(model, tools, messages, request_data):
+def send_message(model, tools, messages, request_data, context=None):
     # Add the new incoming message
     new_message = request_data.get("message", {})
     new_role = new_message.get("role")
@@ -46,54 +58,159 @@ def send_message(model, tools, messages, request_data):
     else:
         raise ValueError(f"Unsupported role: {new_role}")
     
-    print("received message: " + new_text)
-
-    return generate_stream(model, tools, messages)
-
-
-async def generate_stream(model, tools, messages):
-    while True:
-        first = True
-        gathered = None
-        tool_used = False
-
-        async for chunk in model.astream(messages):
-
-            if chunk.content:
-                yield json.dumps({"type": "content", "token": chunk.content}) + "\n"
-
-            if first:
-                gathered = chunk
-                first = False
-            else:
-                gathered += chunk
-
-        if not gathered:
-            break
-
-        messages.append(gathered)
-        print(f"[DEBUG] adding gathered message to list. gathered is of type {type(gathered)}")
-
-        if gathered.tool_calls:
-            for tool_call in gathered.tool_calls:
-                name = tool_call['name']
-                args = tool_call['args']
-                call_id = tool_call['id']
-
-                tool = tools.get(name)
-
-                print(f"[DEBUG] running tool <{name}> with arguments <{args}>")
-                
-
-                result = await tool.ainvoke(input=args)
-
-                tool_message = ToolMessage(
-                    content=str(result),
-                    tool_call_id=call_id
-                )
-
-                messages.append(tool_message)
-                tool_used = True
-
-        if not tool_used:
-            break
\ No newline at end of file
+    logger.debug("received message: %s", new_text)
+
+    return generate_stream(model, tools, messages, context=context)
+
+
+async def generate_stream(model, tools, messages, max_concurrency=TOOL_CONCURRENCY, tool_timeout=TOOL_TIMEOUT, context=None):
+    """
+    Run the agent loop and stream NDJSON events: "content" (coalesced tokens), "tool_start" and
+    "tool_end" around each tool call, then "done" or "error".
+    """
+    context = context or ContextWindow()
+    trace = TurnTrace()
+    status = "error"
+    try:
+        while True:
+            accumulator = StreamAccumulator()
+            coalescer = FrameCoalescer()
+
+            step_started = time.perf_counter()
+            first_token = None
+            async for chunk in with_deadlines(model.astream(context.select(messages)), coalescer):
+                if chunk is None:
+                    # Held-back text is due and no token is arriving
+                    pending = coalescer.flush()
+                    if pending:
+                        yield pending
+                    continue
+                if first_token is None:
+                    first_token = time.perf_counter() - step_started
+                if chunk.content:
+                    if isinstance(chunk.content, str):
+                        pending = coalescer.add(chunk.content)
+                    else:
+                        pending = (coalescer.flush() or "") + frame("content", token=chunk.content)
+                    if pending:
+                        yield pending
+                accumulator.add(chunk)
+
+            pending = coalescer.flush()
+            if pending:
+                yield pending
+            trace.model_step(first_token, time.perf_counter() - step_started)
+
+            gathered = accumulator.message()
+            if not gathered:
+                break
+
+            logger.debug("model step returned %d tool call(s)", len(gathered.tool_calls))
+            if not gathered.tool_calls:
+                messages.append(gathered)
+                break
+
+            # The message with tool calls is only added together with one ToolMessage per call, even when
+            # the client disconnects mid-step; the API rejects a history with unanswered tool calls.
+            tasks = []
+            try:
+                for tool_call in gathered.tool_calls:
+                    yield frame("tool_start", id=tool_call['id'], name=tool_call['name'], args=tool_call['args'])
+                tasks = schedule_tool_calls(tools, gathered.tool_calls, max_concurrency, tool_timeout, trace)
+                pending_tasks = set(tasks)
+                while pending_tasks:
+                    done, pending_tasks = await asyncio.wait(pending_tasks, return_when=asyncio.FIRST_COMPLETED)
+                    for tool_call, task in zip(gathered.tool_calls, tasks):
+                        if task in done:
+                            yield frame("tool_end", id=tool_call['id'], name=tool_call['name'], status=task.result().status)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                messages.append(gathered)
+                messages.extend(_tool_result(tool_call, tasks[i] if i < len(tasks) else None)
+                                for i, tool_call in enumerate(gathered.tool_calls))
+
+        status = "done"
+        yield frame("done")
+    except Exception as e:
+        yield frame("error", message=str(e))
+    finally:
+        trace.finish(status)
+
+
+def _tool_result(tool_call, task):
+    """The ToolMessage of a finished call, or an error ToolMessage for a call that never ran or was cut short."""
+    if task is not None and task.done() and not task.cancelled() and task.exception() is None:
+        return task.result()
+    return ToolMessage(content=f"Error: tool '{tool_call['name']}' was interrupted before it finished.",
+                       tool_call_id=tool_call['id'], status="error")
+
+
+def is_mutating(tool):
+    metadata = getattr(tool, "metadata", None) or {}
+    if "readOnlyHint" in metadata:
+        return not metadata["readOnlyHint"]
+    return tool.name in MUTATING_TOOLS
+
+
+async def run_tool(tools, tool_call, timeout, trace=None, write_timeout=WRITE_TOOL_TIMEOUT):
+    """Run one tool call. Failures and timeouts come back as an error ToolMessage so the model can react to them."""
+    name = tool_call['name']
+    started = time.perf_counter()
+    message = await _call_tool(tools, tool_call, timeout, write_timeout)
+    if trace is not None:
+        trace.tool_call(name, time.perf_counter() - started, len(message.content.encode()), message.status)
+    return message
+
+
+async def _call_tool(tools, tool_call, timeout, write_timeout=WRITE_TOOL_TIMEOUT):
+    name = tool_call['name']
+    args = tool_call['args']
+    call_id = tool_call['id']
+
+    logger.debug("running tool <%s> with arguments <%s>", name, args)
+
+    tool = tools.get(name)
+    if tool is None:
+        return ToolMessage(content=f"Error: unknown tool '{name}'.", tool_call_id=call_id, status="error")
+    mutating = is_mutating(tool)
+    if mutating:
+        timeout = write_timeout
+    try:
+        result = await asyncio.wait_for(tool.ainvoke(input=args), timeout)
+    except asyncio.TimeoutError:
+        if mutating:
+            content = (f"Error: tool '{name}' did not answer within {timeout} seconds. Its changes may or may not have "
+                       f"been saved; check the current data before trying again.")
+        else:
+            content = f"Error: tool '{name}' timed out after {timeout} seconds."
+        return ToolMessage(content=content, tool_call_id=call_id, status="error")
+    except Exception as e:
+        return ToolMessage(content=f"Error: tool '{name}' failed: {e}", tool_call_id=call_id, status="error")
+
+    return ToolMessage(
+        content=str(result),
+        tool_call_id=call_id
+    )
+
+
+def schedule_tool_calls(tools, tool_calls, max_concurrency=TOOL_CONCURRENCY, timeout=TOOL_TIMEOUT, trace=None,
+                        write_timeout=WRITE_TOOL_TIMEOUT):
+    """
+    Start the tool calls of one model step concurrently. Returns one task per call, in call order,
+    each resolving to that call's ToolMessage. Mutating tools still run one at a time, in the order
+    the model asked for them.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    write_lock = asyncio.Lock()
+
+    async def run(tool_call):
+        tool = tools.get(tool_call['name'])
+        if tool is not None and is_mutating(tool):
+            async with write_lock:
+                async with semaphore:
+                    return await run_tool(tools, tool_call, timeout, trace, write_timeout)
+        async with semaphore:
+            return await run_tool(tools, tool_call, timeout, trace)
+
+    return [asyncio.create_task(run(tool_call)) for tool_call in tool_calls]
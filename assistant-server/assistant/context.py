@@ -0,0 +1,109 @@
+import json
+import os
+
+from langchain_core.messages import HumanMessage, ToolMessage
+
+# Most tokens of history sent to the model per call, system message included
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("ASSISTANT_CONTEXT_TOKENS", "12000"))
+# Characters of an old tool result kept once it has been compacted
+COMPACT_TOOL_CHARS = 300
+# Per-message framing overhead in the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:  # tiktoken is optional (and fetches its tables on first use); fall back to ~4 chars per token
+    _encoding = None
+
+
+def _text(message):
+    text = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        text += json.dumps(tool_calls)
+    return text
+
+
+def count_tokens(message):
+    text = _text(message)
+    tokens = len(_encoding.encode(text)) if _encoding else len(text) // 4
+    return tokens + MESSAGE_OVERHEAD_TOKENS
+
+
+def compact_tool_message(message):
+    content = str(message.content)
+    if len(content) <= COMPACT_TOOL_CHARS:
+        return message
+    return ToolMessage(
+        content=f"[earlier tool output, {len(content)} characters, truncated] {content[:COMPACT_TOOL_CHARS]}...",
+        tool_call_id=message.tool_call_id,
+        status=message.status,
+    )
+
+
+class ContextWindow:
+    """
+    Picks the part of a conversation that is sent to the model.
+
+    Token counts are cached per message and only new messages are counted. The system message
+    and the current turn are always sent; earlier turns are added newest first while they fit
+    the budget, with their tool results compacted. Whole turns are kept or dropped, so a tool
+    call is never separated from its result.
+    """
+
+    def __init__(self, budget=CONTEXT_TOKEN_BUDGET):
+        self.budget = budget
+        self._reset(None)
+
+    def _reset(self, first):
+        self._first = first
+        self._counts = []
+        self._compacted = []
+        self._compacted_counts = []
+        self._turn_starts = []
+
+    def _sync(self, messages):
+        if len(messages) < len(self._counts) or not messages or messages[0] is not self._first:
+            # The history was cleared or replaced; start over
+            self._reset(messages[0] if messages else None)
+        for i in range(len(self._counts), len(messages)):
+            message = messages[i]
+            self._counts.append(count_tokens(message))
+            if isinstance(message, ToolMessage):
+                compacted = compact_tool_message(message)
+                self._compacted.append(compacted)
+                self._compacted_counts.append(count_tokens(compacted) if compacted is not message else self._counts[i])
+            else:
+                self._compacted.append(message)
+                self._compacted_counts.append(self._counts[i])
+            if isinstance(message, HumanMessage) and i > 0:
+                self._turn_starts.append(i)
+
+    def select(self, messages):
+        self._sync(messages)
+        if not self._turn_starts:
+            return list(messages)
+
+        current = self._turn_starts[-1]
+        selected = list(messages[current:])
+        used = self._counts[0] + sum(self._counts[current:])
+
+        if used > self.budget:
+            # Even the current turn is too big: compact its tool results from before the latest model reply
+            last_reply = max((i for i in range(current, len(messages)) if not isinstance(messages[i], ToolMessage)),
+                             default=current)
+            selected = [self._compacted[i] if i < last_reply else messages[i] for i in range(current, len(messages))]
+            used = self._counts[0] + sum(self._compacted_counts[i] if i < last_reply else self._counts[i]
+                                         for i in range(current, len(messages)))
+
+        end = current
+        for start in reversed(self._turn_starts[:-1]):
+            cost = sum(self._compacted_counts[start:end])
+            if used + cost > self.budget:
+                break
+            selected[:0] = self._compacted[start:end]
+            used += cost
+            end = start
+
+        return [messages[0]] + selected
@@ -0,0 +1,191 @@
+import asyncio
+import json
+import logging
+import os
+import time
+
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import load_mcp_tools
+
+logger = logging.getLogger("mcp_connections")
+
+DEFAULT_MCP_SERVERS = {
+    "Budget": {"url": "http://localhost:8000/sse", "transport": "sse"},
+    "Calendar": {"url": "http://localhost:8001/sse", "transport": "sse"},
+    "Math": {"url": "http://localhost:8002/sse", "transport": "sse"},
+}
+# Seconds to wait for one server to connect
+CONNECT_TIMEOUT = float(os.environ.get("ASSISTANT_MCP_CONNECT_TIMEOUT", "10"))
+# Seconds between pings on an open connection
+HEALTH_INTERVAL = float(os.environ.get("ASSISTANT_MCP_HEALTH_INTERVAL", "30"))
+# Longest wait between reconnection attempts; the wait doubles from one second up to this
+MAX_BACKOFF = float(os.environ.get("ASSISTANT_MCP_MAX_BACKOFF", "60"))
+# Seconds before a server's tool list is fetched again, the next time tools are needed
+TOOL_REFRESH_INTERVAL = float(os.environ.get("ASSISTANT_MCP_TOOL_REFRESH", "300"))
+# Budget tenant this assistant works for. It is sent as a header on the Budget connection, so the
+# model can never pick another tenant's ledger through tool arguments. Unset means the default ledger.
+TENANT_ID = os.environ.get("ASSISTANT_TENANT_ID")
+TENANT_HEADER = "X-Tenant-ID"
+
+
+def load_server_config():
+    """Servers to connect to: the JSON file named by ASSISTANT_MCP_SERVERS, or the three local servers."""
+    path = os.environ.get("ASSISTANT_MCP_SERVERS")
+    if not path:
+        servers = DEFAULT_MCP_SERVERS
+    else:
+        with open(path, 'r') as f:
+            servers = json.load(f)
+    if TENANT_ID and "Budget" in servers:
+        budget = servers["Budget"]
+        servers = {**servers, "Budget": {**budget, "headers": {**(budget.get("headers") or {}), TENANT_HEADER: TENANT_ID}}}
+    return servers
+
+
+class ServerConnection:
+    """
+    One MCP server's connection, owned by a supervisor task.
+
+    The task connects, pings the server every HEALTH_INTERVAL seconds, and on any failure closes
+    the connection and reconnects with exponential backoff. Opening and closing happen in the
+    same task, which the underlying anyio transports require.
+    """
+
+    def __init__(self, name, config):
+        self.name = name
+        self.config = config
+        self.session = None
+        self.tools = []
+        self.version = 0
+        self.last_error = None
+        self.tools_loaded_at = 0.0
+        self.connected = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._supervise())
+
+    async def _supervise(self):
+        backoff = 1.0
+        while True:
+            client = MultiServerMCPClient({self.name: self.config})
+            try:
+                async with asyncio.timeout(CONNECT_TIMEOUT):
+                    await client.__aenter__()
+            except (Exception, asyncio.TimeoutError) as e:
+                self.last_error = f"connect failed: {e!r}"
+                logger.warning("%s: %s; retrying in %.0fs", self.name, self.last_error, backoff)
+                await self._close(client)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+                continue
+
+            backoff = 1.0
+            self.session = client.sessions[self.name]
+            self.tools = client.get_tools()
+            self.tools_loaded_at = time.monotonic()
+            self.version += 1
+            self.last_error = None
+            self.connected.set()
+            logger.info("%s: connected with %d tool(s)", self.name, len(self.tools))
+            try:
+                while True:
+                    await asyncio.sleep(HEALTH_INTERVAL)
+                    async with asyncio.timeout(CONNECT_TIMEOUT):
+                        await self.session.send_ping()
+            except (Exception, asyncio.TimeoutError) as e:
+                self.last_error = f"connection lost: {e!r}"
+                logger.warning("%s: %s; reconnecting", self.name, self.last_error)
+            finally:
+                self.connected.clear()
+                self.session = None
+                self.tools = []
+                self.version += 1
+                await self._close(client)
+
+    @staticmethod
+    async def _close(client):
+        try:
+            await client.__aexit__(None, None, None)
+        except Exception:
+            pass
+
+    async def refresh_tools(self):
+        """Re-list the server's tools if the last listing is older than TOOL_REFRESH_INTERVAL."""
+        session = self.session
+        if session is None or time.monotonic() - self.tools_loaded_at < TOOL_REFRESH_INTERVAL:
+            return
+        try:
+            tools = await load_mcp_tools(session)
+        except Exception as e:
+            self.last_error = f"tool refresh failed: {e!r}"
+            return
+        self.tools_loaded_at = time.monotonic()
+        if [tool.name for tool in tools] != [tool.name for tool in self.tools]:
+            self.version += 1
+        self.tools = tools
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class MCPConnectionManager:
+    """
+    Pooled connections to every configured MCP server.
+
+    All servers connect concurrently, so startup waits for the slowest one rather than the sum,
+    and is capped at CONNECT_TIMEOUT. Servers that are down keep reconnecting in the background
+    and their tools appear once they are up.
+    """
+
+    def __init__(self, servers=None, wrap_tool=None):
+        self.connections = {name: ServerConnection(name, config) for name, config in (servers or load_server_config()).items()}
+        self.wrap_tool = wrap_tool or (lambda tool: tool)
+        self._bound_version = None
+        self._bound = None
+
+    async def start(self):
+        for connection in self.connections.values():
+            connection.start()
+        waiters = [asyncio.create_task(connection.connected.wait()) for connection in self.connections.values()]
+        _, pending = await asyncio.wait(waiters, timeout=CONNECT_TIMEOUT)
+        for waiter in pending:
+            waiter.cancel()
+        down = [name for name, connection in self.connections.items() if not connection.connected.is_set()]
+        if down:
+            logger.warning("starting without: %s", ", ".join(down))
+
+    async def bind(self, model):
+        """Return (model bound to the currently available tools, {tool name: tool}). Rebinds only when a tool list changed."""
+        await asyncio.gather(*(connection.refresh_tools() for connection in self.connections.values()))
+        version = tuple(connection.version for connection in self.connections.values())
+        if version != self._bound_version:
+            tools = {}
+            for connection in self.connections.values():
+                for tool in connection.tools:
+                    if tool.name in tools:
+                        logger.warning("tool <%s> from %s shadows another server's tool", tool.name, connection.name)
+                    tools[tool.name] = tool
+            self._bound = (model.bind_tools(list(tools.values())),
+                           {name: self.wrap_tool(tool) for name, tool in tools.items()})
+            self._bound_version = version
+        return self._bound
+
+    def health(self):
+        return {
+            name: {
+                "connected": connection.connected.is_set(),
+                "tools": len(connection.tools),
+                "last_error": connection.last_error,
+            }
+            for name, connection in self.connections.items()
+        }
+
+    async def close(self):
+        await asyncio.gather(*(connection.stop() for connection in self.connections.values()))
@@ -0,0 +1,58 @@
+import json
+import logging
+import time
+
+from prometheus_client import Histogram
+
+logger = logging.getLogger("metrics")
+
+TIME_TO_FIRST_TOKEN = Histogram("assistant_time_to_first_token_seconds",
+                                "Time from sending a model request to its first streamed chunk")
+MODEL_STEP_SECONDS = Histogram("assistant_model_step_seconds",
+                               "Time for one model call of the agent loop, until its last chunk",
+                               buckets=(.1, .25, .5, 1, 2, 4, 8, 15, 30, 60, 120))
+TOOL_CALL_SECONDS = Histogram("assistant_tool_call_seconds", "Time for one tool call, as seen by the agent loop",
+                              ["tool", "status"], buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30))
+TOOL_RESULT_BYTES = Histogram("assistant_tool_result_bytes", "Size of a tool result passed back to the model",
+                              ["tool"], buckets=(64, 256, 1024, 4096, 16384, 65536, 262144, 1048576))
+AGENT_ITERATIONS = Histogram("assistant_agent_iterations", "Model calls needed to answer one message",
+                             buckets=(1, 2, 3, 4, 5, 6, 8, 10, 15, 20))
+TURN_SECONDS = Histogram("assistant_turn_seconds", "Time to answer one message, including every model and tool call",
+                         buckets=(.25, .5, 1, 2, 4, 8, 15, 30, 60, 120, 300))
+
+
+class TurnTrace:
+    """
+    Timings of one chat turn. Each measurement goes into the histograms as it is taken, and the
+    whole turn is logged at INFO as a single JSON line when it finishes.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.steps = []
+        self.tools = []
+
+    def model_step(self, first_token, seconds):
+        if first_token is not None:
+            TIME_TO_FIRST_TOKEN.observe(first_token)
+        MODEL_STEP_SECONDS.observe(seconds)
+        logger.debug("model step: first token %s, %.4fs", "none" if first_token is None else f"{first_token:.4f}s", seconds)
+        self.steps.append({"first_token": first_token, "seconds": seconds})
+
+    def tool_call(self, name, seconds, size, status):
+        TOOL_CALL_SECONDS.labels(name, status).observe(seconds)
+        TOOL_RESULT_BYTES.labels(name).observe(size)
+        logger.debug("tool <%s>: %s in %.4fs, %d bytes", name, status, seconds, size)
+        self.tools.append({"name": name, "seconds": seconds, "bytes": size, "status": status})
+
+    def finish(self, status):
+        seconds = time.perf_counter() - self.started
+        AGENT_ITERATIONS.observe(len(self.steps))
+        TURN_SECONDS.observe(seconds)
+        logger.info("trace %s", json.dumps({
+            "status": status,
+            "seconds": round(seconds, 4),
+            "iterations": len(self.steps),
+            "model": [{key: value if value is None else round(value, 4) for key, value in step.items()} for step in self.steps],
+            "tools": [{**tool, "seconds": round(tool["seconds"], 4)} for tool in self.tools],
+        }))
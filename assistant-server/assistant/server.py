@@ -1,26 +1,66 @@
-from quart import Quart, request, Response
-from assistant import send_message, init_model, init_messages
+import logging
+import os
+
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from quart import Quart, request, Response, jsonify
+from assistant import send_message, init_model, init_messages, tool_cache
+from sessions import SessionStore, DEFAULT_SESSION_ID
+
+# Per-turn traces are logged at INFO; per-step and per-tool detail at DEBUG
+logging.basicConfig(level=os.environ.get("ASSISTANT_LOG_LEVEL", "INFO").upper())
 
 app = Quart(__name__)
 
 @app.before_serving
 async def startup():
-    app.model, app.tools, app.mcp_client = await init_model()
-    app.messages = init_messages()
+    app.model, app.mcp = await init_model()
+    app.sessions = SessionStore(init_messages)
+
+def get_session_id(data):
+    return data.get("session_id") or request.headers.get("X-Session-ID") or DEFAULT_SESSION_ID
 
 @app.route('/chat', methods=['POST'])
 async def chat():
     data = await request.get_json()
+    session_id = get_session_id(data)
 
     if data.get("clear"):
-        app.messages = init_messages()
+        await app.sessions.clear(session_id)
         return Response("Messages cleared.", mimetype="text/plain")
 
-    return Response(send_message(app.model, app.tools, app.messages, data), mimetype='application/x-ndjson')
+    # The session stays locked until its reply has finished streaming
+    session = await app.sessions.acquire(session_id)
+    try:
+        model, tools = await app.mcp.bind(app.model)
+        stream = send_message(model, tools, session.messages, data, session.context)
+    except Exception:
+        await app.sessions.release(session)
+        raise
+
+    async def generate():
+        try:
+            async for frame in stream:
+                yield frame
+        finally:
+            await app.sessions.release(session)
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@app.route('/tools/cache', methods=['GET'])
+async def tool_cache_stats():
+    return jsonify(tool_cache.stats())
+
+@app.route('/mcp/health', methods=['GET'])
+async def mcp_health():
+    return jsonify(app.mcp.health())
+
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
 
 @app.after_serving
 async def shutdown():
-    await app.mcp_client.__aexit__(None, None, None)
+    await app.mcp.close()
 
 if __name__ == "__main__":
     app.run(debug=True)
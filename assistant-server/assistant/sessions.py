@@ -0,0 +1,119 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+from langchain_core.messages import messages_from_dict, messages_to_dict
+
+from context import ContextWindow
+
+DEFAULT_SESSION_ID = "default"
+# Conversations kept in memory; the least recently used idle ones beyond this are spilled to disk
+MAX_SESSIONS = int(os.environ.get("ASSISTANT_MAX_SESSIONS", "100"))
+# Rough cap on the text held in memory across all conversations, in characters
+MAX_SESSION_CHARS = int(os.environ.get("ASSISTANT_MAX_SESSION_CHARS", "20000000"))
+# Seconds a conversation may sit idle before it is spilled to disk
+SESSION_TTL = float(os.environ.get("ASSISTANT_SESSION_TTL", "1800"))
+SESSION_DIR = os.environ.get("ASSISTANT_SESSION_DIR", "sessions")
+
+
+class Session:
+    def __init__(self, session_id, messages):
+        self.session_id = session_id
+        self.messages = messages
+        self.context = ContextWindow()
+        self.lock = asyncio.Lock()
+        self.users = 0
+        self.last_used = time.monotonic()
+        self.size = 0
+
+    def measure(self):
+        self.size = sum(len(str(message.content)) for message in self.messages)
+
+
+class SessionStore:
+    """
+    Conversation histories keyed by session ID.
+
+    Each session has its own lock, so one user's turn never interleaves with another turn of the
+    same session while different sessions run in parallel. Idle sessions past the TTL, or beyond
+    the count/size caps (least recently used first), are written to disk and loaded back on demand.
+    """
+
+    def __init__(self, init_messages, directory=SESSION_DIR, max_sessions=MAX_SESSIONS,
+                 max_chars=MAX_SESSION_CHARS, ttl=SESSION_TTL):
+        self.init_messages = init_messages
+        self.directory = directory
+        self.max_sessions = max_sessions
+        self.max_chars = max_chars
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = asyncio.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, session_id):
+        return os.path.join(self.directory, hashlib.sha256(session_id.encode()).hexdigest() + ".json")
+
+    def _load(self, session_id):
+        path = self._path(session_id)
+        if not os.path.exists(path):
+            return self.init_messages()
+        with open(path, 'r') as f:
+            return messages_from_dict(json.load(f))
+
+    def _spill(self, session):
+        path = self._path(session.session_id)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(messages_to_dict(session.messages), f)
+        os.replace(tmp_path, path)
+
+    async def acquire(self, session_id):
+        """Return the session with its lock held. Every acquire must be paired with release()."""
+        async with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                messages = await asyncio.to_thread(self._load, session_id)
+                session = self._sessions[session_id] = Session(session_id, messages)
+                session.measure()
+            self._sessions.move_to_end(session_id)
+            session.users += 1
+        await session.lock.acquire()
+        return session
+
+    async def release(self, session):
+        session.lock.release()
+        session.measure()
+        session.last_used = time.monotonic()
+        async with self._lock:
+            session.users -= 1
+            await self._evict()
+
+    async def clear(self, session_id):
+        session = await self.acquire(session_id)
+        try:
+            session.messages[:] = self.init_messages()
+            path = self._path(session_id)
+            if os.path.exists(path):
+                os.remove(path)
+        finally:
+            await self.release(session)
+
+    async def _evict(self):
+        now = time.monotonic()
+        total_chars = sum(session.size for session in self._sessions.values())
+        for session_id, session in list(self._sessions.items()):
+            over_cap = len(self._sessions) > self.max_sessions or total_chars > self.max_chars
+            expired = now - session.last_used > self.ttl
+            if not (over_cap or expired):
+                continue
+            if session.users:
+                continue
+            await asyncio.to_thread(self._spill, session)
+            del self._sessions[session_id]
+            total_chars -= session.size
+
+    def __len__(self):
+        return len(self._sessions)
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import os
+import time
+
+from langchain_core.messages import AIMessageChunk
+from langchain_core.messages.ai import add_usage
+
+# Content frames are held back until they reach this many bytes...
+FRAME_MAX_BYTES = int(os.environ.get("ASSISTANT_FRAME_BYTES", "256"))
+# ...or until this many seconds have passed since the first held-back token
+FRAME_MAX_DELAY = float(os.environ.get("ASSISTANT_FRAME_DELAY", "0.05"))
+
+
+def frame(event_type, **fields):
+    """One NDJSON line of the /chat stream."""
+    return json.dumps({"type": event_type, **fields}) + "\n"
+
+
+class StreamAccumulator:
+    """
+    Builds the final message from streamed AIMessageChunks in linear time.
+
+    `chunk + chunk` re-concatenates everything gathered so far on every token; here content
+    pieces and tool-call argument fragments are collected in lists and joined once at the end.
+    """
+
+    def __init__(self):
+        self._first = None
+        self._text = []
+        self._parts = []
+        self._tool_calls = {}
+        self._response_metadata = {}
+        self._usage = None
+
+    def add(self, chunk):
+        if self._first is None:
+            self._first = chunk
+        if isinstance(chunk.content, str):
+            self._text.append(chunk.content)
+        else:
+            self._parts.extend(chunk.content)
+        for position, tool_chunk in enumerate(chunk.tool_call_chunks):
+            index = tool_chunk.get("index")
+            call = self._tool_calls.setdefault(position if index is None else index,
+                                               {"name": [], "args": [], "id": None})
+            if tool_chunk.get("name"):
+                call["name"].append(tool_chunk["name"])
+            if tool_chunk.get("args"):
+                call["args"].append(tool_chunk["args"])
+            if tool_chunk.get("id") and call["id"] is None:
+                call["id"] = tool_chunk["id"]
+        self._response_metadata.update(chunk.response_metadata)
+        if chunk.usage_metadata:
+            self._usage = add_usage(self._usage, chunk.usage_metadata)
+
+    def message(self):
+        """The assembled AIMessageChunk, or None if nothing was streamed."""
+        if self._first is None:
+            return None
+        content = "".join(self._text)
+        if self._parts:
+            content = ([content] if content else []) + self._parts
+        return AIMessageChunk(
+            content=content,
+            id=self._first.id,
+            tool_call_chunks=[
+                {"name": "".join(call["name"]) or None, "args": "".join(call["args"]), "id": call["id"], "index": index}
+                for index, call in sorted(self._tool_calls.items())
+            ],
+            response_metadata=self._response_metadata,
+            usage_metadata=self._usage,
+        )
+
+
+class FrameCoalescer:
+    """Merges content tokens into fewer frames, bounded by size and by how long a token may wait."""
+
+    def __init__(self, max_bytes=FRAME_MAX_BYTES, max_delay=FRAME_MAX_DELAY):
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self._tokens = []
+        self._size = 0
+        self._since = None
+
+    def add(self, token):
+        """Buffer a token; returns a frame when one is due, else None."""
+        if not self._tokens:
+            self._since = time.monotonic()
+        self._tokens.append(token)
+        self._size += len(token.encode())
+        if self._size >= self.max_bytes or time.monotonic() - self._since >= self.max_delay:
+            return self.flush()
+        return None
+
+    def time_left(self):
+        """Seconds until the held-back text is due, or None when nothing is held back."""
+        if not self._tokens:
+            return None
+        return max(0.0, self._since + self.max_delay - time.monotonic())
+
+    def flush(self):
+        if not self._tokens:
+            return None
+        token = "".join(self._tokens)
+        self._tokens = []
+        self._size = 0
+        return frame("content", token=token)
+
+
+_END = object()
+
+
+async def with_deadlines(chunks, coalescer):
+    """
+    Yield the chunks of an async stream as they arrive, plus None whenever the coalescer's held-back
+    text falls due while no chunk arrives, so the caller can flush it on time rather than at the next
+    token, which may be a long way off when tool-call arguments stream without content.
+
+    The stream is consumed by a single producer task, so it runs start to end in one task and context.
+    """
+    queue = asyncio.Queue()
+
+    async def pump():
+        try:
+            async for chunk in chunks:
+                queue.put_nowait(chunk)
+        except Exception as e:
+            queue.put_nowait(e)
+        else:
+            queue.put_nowait(_END)
+
+    producer = asyncio.create_task(pump())
+    try:
+        while True:
+            timeout = coalescer.time_left()
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        producer.cancel()
@@ -0,0 +1,167 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+logger = logging.getLogger("tool_cache")
+
+# Budget tools that change the ledger
+BUDGET_WRITE_TOOLS = {
+    "add_expense", "add_income", "edit_record", "delete_record", "add_category_alias",
+    "add_records", "edit_records", "delete_records", "import_statement",
+    "add_recurring", "delete_recurring",
+}
+
+# Seconds a read-only tool's result stays fresh. Tools not listed are never cached.
+TOOL_CACHE_TTLS = {
+    "get_expense_total": 300,
+    "get_income_total": 300,
+    "get_balance": 300,
+    "get_expenses": 300,
+    "get_incomes": 300,
+    "find_records": 300,
+    "get_expense_total_for_category": 300,
+    "get_income_total_for_category": 300,
+    "get_expense_breakdown_by_category": 300,
+    "get_income_breakdown_by_category": 300,
+    "list_recurring": 300,
+    "get_cash_flow_forecast": 300,
+    "get_allowed_categories": 3600,
+    "get_events": 120,
+}
+
+# Cached tools whose results a budget write can change
+BUDGET_READ_TOOLS = set(TOOL_CACHE_TTLS) - {"get_allowed_categories", "get_events"}
+
+# Writes that add one dated record only affect cached reads whose date range covers that date
+DATED_WRITES = {"add_expense", "add_income"}
+
+# Reads that depend on records outside their own date range (the forecast projects from past history), so every budget write drops them
+HISTORY_READS = {"get_cash_flow_forecast"}
+
+
+def _parse_date(value):
+    """Parse an ISO date; dates with a UTC offset become naive UTC, as the Budget server stores them."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _covers(read_args, date):
+    from_dt = _parse_date(read_args.get("from_date"))
+    to_dt = _parse_date(read_args.get("to_date"))
+    if from_dt is None or to_dt is None or date is None:
+        return True
+    return from_dt <= date <= to_dt
+
+
+class ToolResultCache:
+    """
+    Results of read-only tool calls, keyed by tool name plus canonicalized arguments.
+
+    Entries expire after the tool's TTL and the least recently used are dropped beyond
+    `max_entries`. A budget write drops the cached reads it can affect.
+    """
+
+    def __init__(self, ttls=TOOL_CACHE_TTLS, max_entries=512):
+        self.ttls = ttls
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(name, args):
+        return json.dumps([name, args], sort_keys=True, default=str)
+
+    def get(self, name, args):
+        """Return (True, result) on a fresh hit, (False, None) otherwise."""
+        key = self.key(name, args)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, entry[3]
+
+    def generation(self):
+        return self._generation
+
+    def put(self, name, args, result, generation):
+        """Store a result, unless a write invalidated the cache while the call was running."""
+        if generation != self._generation:
+            return
+        self._entries[self.key(name, args)] = (time.monotonic() + self.ttls[name], name, args, result)
+        self._entries.move_to_end(self.key(name, args))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, write_name, write_args):
+        if write_name not in BUDGET_WRITE_TOOLS:
+            return
+        self._generation += 1
+        date = _parse_date(write_args.get("date")) if write_name in DATED_WRITES else None
+        for key, (_, name, args, _) in list(self._entries.items()):
+            if name in BUDGET_READ_TOOLS and (write_name not in DATED_WRITES or name in HISTORY_READS or _covers(args, date)):
+                del self._entries[key]
+                self.invalidations += 1
+
+    def clear(self):
+        self._generation += 1
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+        }
+
+
+class CachedTool:
+    """Stands in for an MCP tool in the tools dict: cacheable calls are answered from the cache, writes invalidate it."""
+
+    def __init__(self, tool, cache):
+        self.tool = tool
+        self.cache = cache
+        self.name = tool.name
+        self.metadata = getattr(tool, "metadata", None)
+
+    async def ainvoke(self, input):
+        if self.name not in self.cache.ttls:
+            try:
+                return await self.tool.ainvoke(input=input)
+            finally:
+                self._invalidate(input)
+
+        found, result = self.cache.get(self.name, input)
+        if found:
+            return result
+        generation = self.cache.generation()
+        result = await self.tool.ainvoke(input=input)
+        self.cache.put(self.name, input, result, generation)
+        return result
+
+    def _invalidate(self, input):
+        # The write has already run: a failure here must not turn its result into an error the model
+        # would retry. Drop the whole cache instead, so no stale read survives either.
+        try:
+            self.cache.invalidate(self.name, input)
+        except Exception as e:
+            logger.warning("invalidation after <%s> failed: %r; clearing the cache", self.name, e)
+            self.cache.clear()
@@ -0,0 +1,11 @@
+# _paths.py
+# The servers are run from their own directories with flat imports; make those modules importable here.
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for directory in ("mcp-server/budget", "mcp-server", "assistant-server/assistant"):
+    path = os.path.join(ROOT, directory)
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,113 @@
+"""
+BudgetManager benchmarks over synthetic ledgers.
+
+For each ledger size this measures cold start (reading and indexing the whole ledger), the read
+paths the Budget tools use, single writes and batched writes through AsyncBudgetManager, and the
+process's memory once the ledger is loaded.
+
+    python benchmarks/bench_budget.py --sizes 1000,10000,100000,1000000
+    python benchmarks/bench_budget.py --save-baseline    # store the results to compare later runs with
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import _paths  # noqa: F401
+from async_budget_manager import AsyncBudgetManager
+from budget_manager import ALLOWED_CATEGORIES, BudgetManager
+from ledger import build_ledger, random_range
+from stats import report, rss_mb, summarize
+
+
+def _time_calls(call, repeat):
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def _time_concurrent_writes(manager, count, seed):
+    rng = random.Random(seed)
+    front = AsyncBudgetManager(manager)
+    latencies = []
+
+    async def write():
+        from_date, _ = random_range(rng)
+        t0 = time.perf_counter()
+        await front.add_record("expense", from_date, 12.5, "benchmark", rng.choice(ALLOWED_CATEGORIES))
+        latencies.append(time.perf_counter() - t0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(write() for _ in range(count)))
+    elapsed = time.perf_counter() - started
+    await front.aclose()
+    return summarize(latencies, elapsed)
+
+
+def bench_size(size, repeat, seed):
+    source = build_ledger(size, seed)
+    workdir = tempfile.mkdtemp(prefix="budget-bench-")
+    try:
+        path = os.path.join(workdir, "ledger.db")
+        shutil.copy(source, path)
+        gc.collect()
+        rss_before = rss_mb()
+
+        t0 = time.perf_counter()
+        manager = BudgetManager(path)
+        load_seconds = time.perf_counter() - t0
+        results = {f"{size}/load": {"ms": load_seconds * 1000, "rss_mb": rss_mb() - rss_before}}
+
+        rng = random.Random(seed)
+
+        def ranged(call):
+            return lambda: call(*random_range(rng))
+
+        results[f"{size}/get_total"] = _time_calls(ranged(lambda a, b: manager.get_total("expense", a, b)), repeat)
+        results[f"{size}/get_balance"] = _time_calls(ranged(manager.get_balance), repeat)
+        results[f"{size}/breakdown"] = _time_calls(
+            ranged(lambda a, b: manager.get_total_breakdown_by_category("expense", a, b)), repeat)
+        results[f"{size}/page_records"] = _time_calls(
+            ranged(lambda a, b: manager.page_records("expense", a, b, limit=50)), repeat)
+        results[f"{size}/find_description"] = _time_calls(
+            lambda: manager.find_records("expense", description="coffee"), max(1, repeat // 10))
+        results[f"{size}/add_record"] = _time_calls(
+            lambda: manager.add_record("expense", random_range(rng)[0], 9.99, "benchmark", "food"), repeat)
+        # Runs last: it closes the manager once the queued writes have committed.
+        results[f"{size}/add_concurrent"] = asyncio.run(_time_concurrent_writes(manager, repeat, seed))
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000",
+                        help="comma-separated ledger sizes (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=200, help="calls per measured operation (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default="budget", help="name of the stored baseline (default: %(default)s)")
+    parser.add_argument("--save-baseline", action="store_true", help="replace the stored baseline with these results")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="fraction a metric may worsen before it counts as a regression (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for size in (int(size) for size in args.sizes.split(",")):
+        print(f"benchmarking {size} records...", file=sys.stderr)
+        results.update(bench_size(size, args.repeat, args.seed))
+    return report(args.baseline, results, save=args.save_baseline, tolerance=args.tolerance)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
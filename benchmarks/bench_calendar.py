@@ -0,0 +1,216 @@
+"""
+Calendar sync benchmarks and checks against an in-process fake of the Google Calendar API.
+
+Runs fetch_events over FakeCalendarService through a full sync of several paged calendars, then
+incremental syncs after events are added, moved and cancelled, then a sync whose token has expired
+(410 Gone, answered with a full resync), and finally reads served from the local store alone. After
+every sync the events returned are compared with the fake's own, so a run also fails on wrong results.
+
+    python benchmarks/bench_calendar.py --events 5000 --calendars 3
+    python benchmarks/bench_calendar.py --save-baseline    # store the results to compare later runs with
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import _paths  # noqa: F401
+from fake_calendar import FakeCalendarService, make_event, random_events
+from stats import report, summarize
+
+FIRST_DAY = date(2024, 1, 1)
+DAYS = 365
+
+
+class CheckFailed(Exception):
+    pass
+
+
+def build_service(calendars, events, page_size, seed):
+    service = FakeCalendarService(page_size=page_size)
+    rng = random.Random(seed)
+    for n in range(calendars):
+        calendar_id = "primary" if n == 0 else f"calendar{n}@example.com"
+        service.add_calendar(calendar_id, f"Calendar {n}")
+        for event in random_events(rng, events // calendars, FIRST_DAY, DAYS, prefix=f"c{n}-"):
+            service.put_event(calendar_id, event)
+    return service
+
+
+def expected_events(service, time_min, time_max):
+    """What fetch_events should return, computed from the fake directly: events overlapping [time_min, time_max)."""
+    from date_parser import parse_event_time
+
+    expected = []
+    for calendar_id, name in service.calendars.items():
+        for event in service.live_events(calendar_id):
+            start_ts = parse_event_time(event["start"])[2]
+            end_ts = parse_event_time(event["end"])[2]
+            if start_ts < time_max.timestamp() and (end_ts > time_min.timestamp() or start_ts >= time_min.timestamp()):
+                expected.append((name, event.get("summary", "No Title"), start_ts))
+    return sorted(expected)
+
+
+async def fetch(client, store, start_date, end_date):
+    from calendar_server import fetch_events, list_calendars
+
+    calendars = await list_calendars(client, max_age=0)
+    return await fetch_events(start_date, end_date, client=client, store=store, calendars=calendars)
+
+
+def check_events(service, events, start_date, end_date):
+    """fetch_events must return exactly the fake's events in the range, in start-time order."""
+    starts = [event.start_ts for event in events]
+    if starts != sorted(starts):
+        raise CheckFailed(f"{start_date}..{end_date}: events are not in start-time order")
+    time_min = datetime.fromisoformat(start_date).replace(tzinfo=timezone.utc)
+    time_max = datetime.fromisoformat(end_date).replace(tzinfo=timezone.utc) + timedelta(days=1)
+    got = sorted((event.calendar, event.event_name, event.start_ts) for event in events)
+    want = expected_events(service, time_min, time_max)
+    if got != want:
+        raise CheckFailed(f"{start_date}..{end_date}: {len(got)} events returned, {len(want)} expected "
+                          f"({len(set(want) - set(got))} missing, {len(set(got) - set(want))} unexpected)")
+
+
+async def timed_fetch(service, client, store, rng, latencies):
+    """Fetch a random range, timing only the fetch, then check what came back."""
+    dates = random_range(rng)
+    t0 = time.perf_counter()
+    events = await fetch(client, store, *dates)
+    latencies.append(time.perf_counter() - t0)
+    check_events(service, events, *dates)
+
+
+def check_store(service, store):
+    """After a sync the local copy of every calendar must match the fake event for event, outside the range asked about too."""
+    everything = (datetime(1970, 1, 2, tzinfo=timezone.utc), datetime(2100, 1, 1, tzinfo=timezone.utc))
+    for calendar_id in service.calendars:
+        got = sorted((event["id"], event["start"], event.get("summary")) for event in store.query(calendar_id, *everything))
+        want = sorted((event["id"], event["start"], event.get("summary")) for event in service.live_events(calendar_id))
+        if got != want:
+            raise CheckFailed(f"{calendar_id}: local copy has {len(got)} events, the API {len(want)}")
+
+
+def random_range(rng, days=31):
+    first = FIRST_DAY + timedelta(days=rng.randrange(DAYS - days))
+    return first.isoformat(), (first + timedelta(days=rng.randrange(days))).isoformat()
+
+
+def change_events(service, rng, count, tag):
+    """Add, move and cancel `count` events in each calendar, as edits made in Google Calendar would."""
+    for calendar_id in service.calendars:
+        live = service.live_events(calendar_id)
+        for n, event in enumerate(random_events(rng, count, FIRST_DAY, DAYS, prefix=f"{calendar_id}-{tag}-")):
+            service.put_event(calendar_id, event)
+            moved = rng.choice(live)
+            start = datetime.fromisoformat(moved["start"].get("dateTime") or moved["start"]["date"])
+            start = start.replace(tzinfo=start.tzinfo or timezone.utc) + timedelta(days=rng.randrange(-3, 4))
+            service.put_event(calendar_id, make_event(moved["id"], start, 45, summary=f"{moved['id']} (moved {tag}.{n})"))
+            service.cancel_event(calendar_id, rng.choice(live)["id"])
+
+
+def _events_requests(service, since):
+    return [params for kind, params in service.requests[since:] if kind == "events"]
+
+
+async def bench(events, calendars, page_size, repeat, seed, workdir):
+    from calendar_client import CalendarClient
+    from event_store import EventStore
+
+    service = build_service(calendars, events, page_size, seed)
+    client = CalendarClient(service=service)
+    rng = random.Random(seed)
+    results = {}
+
+    full, pages = [], []
+    for n in range(repeat):
+        store = EventStore(os.path.join(workdir, f"full-{n}.db"), max_staleness=0)
+        since = len(service.requests)
+        await timed_fetch(service, client, store, rng, full)
+        check_store(service, store)
+        requests = _events_requests(service, since)
+        if any(params["syncToken"] for params in requests):
+            raise CheckFailed("a first sync sent a sync token")
+        pages.append(len(requests) / calendars)
+        store.close()
+    results[f"{events}/full_sync"] = dict(summarize(full), pages_per_calendar=sum(pages) / len(pages))
+
+    # Every fetch from here on syncs first, since the store treats any copy as stale
+    store = EventStore(os.path.join(workdir, "incremental.db"), max_staleness=0)
+    await fetch(client, store, *random_range(rng))
+    incremental = []
+    for n in range(repeat):
+        change_events(service, rng, max(1, events // calendars // 100), f"inc{n}")
+        since = len(service.requests)
+        await timed_fetch(service, client, store, rng, incremental)
+        check_store(service, store)
+        if not all(params["syncToken"] for params in _events_requests(service, since)):
+            raise CheckFailed("an incremental sync was answered with a full listing")
+    results[f"{events}/incremental_sync"] = summarize(incremental)
+
+    expired = []
+    for n in range(repeat):
+        change_events(service, rng, max(1, events // calendars // 100), f"exp{n}")
+        service.expire_sync_tokens()
+        since = len(service.requests)
+        await timed_fetch(service, client, store, rng, expired)
+        check_store(service, store)
+        requests = _events_requests(service, since)
+        resynced = {params["calendarId"] for params in requests if not params["syncToken"]}
+        if resynced != set(service.calendars):
+            raise CheckFailed("an expired sync token did not lead to a full resync of every calendar")
+    results[f"{events}/expired_token_resync"] = summarize(expired)
+    store.close()
+
+    # Fresh enough to answer from SQLite without calling the API at all
+    store = EventStore(os.path.join(workdir, "cached.db"), max_staleness=3600)
+    await fetch(client, store, *random_range(rng))
+    cached = []
+    since = len(service.requests)
+    for _ in range(repeat):
+        await timed_fetch(service, client, store, rng, cached)
+    if _events_requests(service, since):
+        raise CheckFailed("a fresh local copy was synced again")
+    results[f"{events}/cached_query"] = summarize(cached)
+    store.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=5000, help="events across all calendars (default: %(default)s)")
+    parser.add_argument("--calendars", type=int, default=3, help="(default: %(default)s)")
+    parser.add_argument("--page-size", type=int, default=250,
+                        help="most events the fake returns per page (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=10, help="runs per measured operation (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default="calendar", help="name of the stored baseline (default: %(default)s)")
+    parser.add_argument("--save-baseline", action="store_true", help="replace the stored baseline with these results")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="fraction a metric may worsen before it counts as a regression (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    # calendar_server opens its default event store in the working directory on import
+    workdir = tempfile.mkdtemp(prefix="calendar-bench-")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        print(f"benchmarking {args.events} events in {args.calendars} calendars...", file=sys.stderr)
+        results = asyncio.run(bench(args.events, args.calendars, args.page_size, args.repeat, args.seed, workdir))
+    except CheckFailed as e:
+        print(f"check failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report(args.baseline, results, save=args.save_baseline, tolerance=args.tolerance)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
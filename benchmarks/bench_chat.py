@@ -0,0 +1,186 @@
+"""
+Load test for the /chat endpoint.
+
+Runs many concurrent sessions, each sending a few messages in a row, and reports time to first
+token, full turn latency, throughput and memory. By default the Quart app is driven in-process with
+FakeChatModel and in-process Budget/Calendar stand-ins over a synthetic ledger, so nothing but the
+pipeline itself is measured. With --url it drives an already running server instead.
+
+    python benchmarks/bench_chat.py --sessions 100 --turns 5
+    python benchmarks/bench_chat.py --url http://localhost:5000/chat --sessions 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import _paths  # noqa: F401
+from ledger import build_ledger
+from stats import report, rss_mb, summarize
+
+QUESTIONS = ("How much did I spend", "What is my balance", "Where did my money go", "What is on my calendar",
+             "Summarize my week", "Any big expenses")
+
+
+class TurnResult:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token = None
+        self.finished = None
+        self.frames = 0
+        self.status = None
+        self._partial = b""
+
+    def feed(self, data):
+        lines = (self._partial + data).split(b"\n")
+        self._partial = lines.pop()
+        for line in lines:
+            if not line:
+                continue
+            event = json.loads(line)
+            self.frames += 1
+            if event["type"] == "content" and self.first_token is None:
+                self.first_token = time.perf_counter() - self.started
+            elif event["type"] in ("done", "error"):
+                self.status = event["type"]
+
+    def finish(self):
+        self.finished = time.perf_counter() - self.started
+
+
+async def _asgi_post(app, path, payload, result):
+    """POST to an ASGI app directly, feeding each streamed body chunk to `result` as it arrives."""
+    body = json.dumps(payload).encode()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 0), "server": ("127.0.0.1", 80), "extensions": {},
+    }
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # The client never disconnects; the app cancels this wait once the response is complete.
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            result.feed(message["body"])
+
+    await app(scope, receive, send)
+
+
+def in_process_app(args, workdir):
+    """The real Quart app, wired to the fake model and in-process tool servers instead of init_model()."""
+    from async_budget_manager import AsyncBudgetManager
+    from budget_manager import BudgetManager
+    from fakes import FakeChatModel, FakeConnections, budget_tools, calendar_tools
+    from server import app
+    from sessions import SessionStore
+    from assistant import init_messages, tool_cache
+
+    ledger = os.path.join(workdir, "ledger.db")
+    shutil.copy(build_ledger(args.ledger_size, args.seed), ledger)
+    budget = AsyncBudgetManager(BudgetManager(ledger))
+
+    app.model = FakeChatModel(reply_tokens=args.reply_tokens, first_token_delay=args.first_token_delay,
+                              token_delay=args.token_delay, seed=args.seed)
+    app.mcp = FakeConnections(budget_tools(budget, args.tool_latency) + calendar_tools(latency=args.tool_latency),
+                              cache=None if args.no_cache else tool_cache)
+    app.sessions = SessionStore(init_messages, directory=os.path.join(workdir, "sessions"))
+
+    async def post(payload, result):
+        await _asgi_post(app, "/chat", payload, result)
+
+    async def close():
+        await budget.aclose()
+
+    return post, close
+
+
+def http_client(url):
+    import httpx
+
+    client = httpx.AsyncClient(timeout=None)
+
+    async def post(payload, result):
+        async with client.stream("POST", url, json=payload) as response:
+            async for data in response.aiter_bytes():
+                result.feed(data)
+
+    return post, client.aclose
+
+
+async def run_load(post, sessions, turns, seed):
+    rng = random.Random(seed)
+    results = []
+
+    async def session(number):
+        session_id = f"bench-{number}"
+        for turn in range(turns):
+            question = f"{rng.choice(QUESTIONS)} ({rng.randrange(50)})?"
+            result = TurnResult()
+            await post({"session_id": session_id, "message": {"role": "user", "text": question}}, result)
+            result.finish()
+            results.append(result)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(session(number) for number in range(sessions)))
+    return results, time.perf_counter() - started
+
+
+async def bench(args):
+    workdir = tempfile.mkdtemp(prefix="chat-bench-")
+    try:
+        post, close = http_client(args.url) if args.url else in_process_app(args, workdir)
+        rss_before = rss_mb()
+        try:
+            results, elapsed = await run_load(post, args.sessions, args.turns, args.seed)
+        finally:
+            await close()
+        completed = [result for result in results if result.status == "done"]
+        turns = summarize([result.finished for result in completed], elapsed)
+        turns["errors"] = len(results) - len(completed)
+        return {
+            "chat/turn": turns,
+            "chat/first_token": summarize([result.first_token for result in completed if result.first_token is not None]),
+            "chat/memory": {"rss_mb": rss_mb(), "rss_growth_mb": rss_mb() - rss_before},
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="drive a running server's /chat endpoint instead of the in-process app")
+    parser.add_argument("--sessions", type=int, default=50, help="concurrent sessions (default: %(default)s)")
+    parser.add_argument("--turns", type=int, default=5, help="messages per session (default: %(default)s)")
+    parser.add_argument("--ledger-size", type=int, default=10000, help="records in the Budget ledger (default: %(default)s)")
+    parser.add_argument("--reply-tokens", type=int, default=60)
+    parser.add_argument("--first-token-delay", type=float, default=0.05, help="fake model latency in seconds")
+    parser.add_argument("--token-delay", type=float, default=0.002)
+    parser.add_argument("--tool-latency", type=float, default=0.002, help="simulated MCP round trip in seconds")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the tool result cache")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default="chat", help="name of the stored baseline (default: %(default)s)")
+    parser.add_argument("--save-baseline", action="store_true", help="replace the stored baseline with these results")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="fraction a metric may worsen before it counts as a regression (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(bench(args))
+    return report(args.baseline, results, save=args.save_baseline, tolerance=args.tolerance)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+# fake_calendar.py
+# An in-process stand-in for the Google Calendar API, so the calendar server's sync can be run and checked offline.
+
+import json
+from datetime import datetime, timedelta, timezone
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+
+class _Request:
+    """A prepared request; like the client library's, nothing is fetched until `execute`."""
+
+    def __init__(self, call):
+        self._call = call
+
+    def execute(self, http=None):
+        return self._call()
+
+
+class _Collection:
+    def __init__(self, list_call):
+        self._list_call = list_call
+
+    def list(self, **params):
+        return _Request(lambda: self._list_call(**params))
+
+
+def _http_error(status, message):
+    body = json.dumps({"error": {"code": status, "message": message}}).encode()
+    return HttpError(httplib2.Response({"status": status}), body)
+
+
+class FakeCalendarService:
+    """
+    The events().list and calendarList().list calls the calendar server makes, over in-memory calendars.
+
+    Results come in pages of at most `page_size`. The last page of a listing carries a nextSyncToken;
+    listing with it returns only the events changed since, cancelled ones included. After
+    `expire_sync_tokens`, every token issued so far fails with 410 Gone, as Google's do once they
+    are too old. Each call is recorded in `requests` as (kind, params).
+    """
+
+    def __init__(self, page_size=250):
+        self.page_size = page_size
+        self.calendars = {}
+        # (calendar id, event id) -> latest version of the event, cancelled ones included
+        self.stored = {}
+        # (calendar id, event id) -> sequence number of its last change; sync tokens are "<epoch>:<sequence>"
+        self.changed = {}
+        self.sequence = 0
+        self.epoch = 0
+        self.requests = []
+
+    def add_calendar(self, calendar_id, name):
+        self.calendars[calendar_id] = name
+
+    def put_event(self, calendar_id, event):
+        """Create or replace an event, as if it had been edited in Google Calendar."""
+        self.sequence += 1
+        self.stored[(calendar_id, event["id"])] = dict(event, status=event.get("status", "confirmed"))
+        self.changed[(calendar_id, event["id"])] = self.sequence
+
+    def cancel_event(self, calendar_id, event_id):
+        self.put_event(calendar_id, dict(self.stored[(calendar_id, event_id)], status="cancelled"))
+
+    def expire_sync_tokens(self):
+        self.epoch += 1
+
+    def live_events(self, calendar_id):
+        return [event for (event_calendar, _), event in self.stored.items()
+                if event_calendar == calendar_id and event["status"] != "cancelled"]
+
+    def events(self):
+        return _Collection(self._list_events)
+
+    def calendarList(self):
+        return _Collection(self._list_calendars)
+
+    def _list_calendars(self, pageToken=None, **params):
+        self.requests.append(("calendarList", dict(params, pageToken=pageToken)))
+        items = [{"id": calendar_id, "summary": name} for calendar_id, name in self.calendars.items()]
+        offset = int(pageToken or 0)
+        result = {"items": items[offset:offset + self.page_size]}
+        if offset + self.page_size < len(items):
+            result["nextPageToken"] = str(offset + self.page_size)
+        return result
+
+    def _list_events(self, calendarId, syncToken=None, pageToken=None, maxResults=250, **params):
+        self.requests.append(("events", dict(params, calendarId=calendarId, syncToken=syncToken, pageToken=pageToken)))
+        if calendarId not in self.calendars:
+            raise _http_error(404, "Not Found")
+        since = None
+        if syncToken is not None:
+            epoch, since = map(int, syncToken.split(":"))
+            if epoch != self.epoch:
+                raise _http_error(410, "Sync token is no longer valid, a full sync is required.")
+        # A page token pins the listing to the changes known when its first page was served
+        offset, upto = map(int, pageToken.split(":")) if pageToken else (0, self.sequence)
+        keys = sorted((key for key in self.stored
+                       if key[0] == calendarId and self.changed[key] <= upto
+                       and (self.changed[key] > since if since is not None else self.stored[key]["status"] != "cancelled")),
+                      key=self.changed.get)
+        size = min(maxResults, self.page_size)
+        result = {"kind": "calendar#events", "items": [self.stored[key] for key in keys[offset:offset + size]]}
+        if offset + size < len(keys):
+            result["nextPageToken"] = f"{offset + size}:{upto}"
+        else:
+            result["nextSyncToken"] = f"{self.epoch}:{upto}"
+        return result
+
+
+def make_event(event_id, start, minutes=60, summary=None, all_day=False):
+    """An event resource as the API returns it. `start` is a timezone-aware datetime."""
+    if all_day:
+        day = start.date()
+        times = {"start": {"date": day.isoformat()}, "end": {"date": (day + timedelta(days=1)).isoformat()}}
+    else:
+        times = {"start": {"dateTime": start.isoformat()},
+                 "end": {"dateTime": (start + timedelta(minutes=minutes)).isoformat()}}
+    return {"kind": "calendar#event", "id": event_id, "status": "confirmed", "summary": summary or event_id, **times}
+
+
+def random_events(rng, count, first_day, days, prefix="event"):
+    """`count` events spread over `days` days from `first_day` (a date): mostly timed, some all-day."""
+    events = []
+    for n in range(count):
+        day = first_day + timedelta(days=rng.randrange(days))
+        start = datetime(day.year, day.month, day.day, rng.randrange(7, 20), rng.choice((0, 15, 30, 45)),
+                         tzinfo=timezone.utc)
+        events.append(make_event(f"{prefix}{n}", start, rng.choice((30, 60, 90, 180)), all_day=rng.random() < 0.1))
+    return events
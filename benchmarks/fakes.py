@@ -0,0 +1,149 @@
+# fakes.py
+# Offline stand-ins for the chat model and the MCP servers, so the chat pipeline can be load-tested without network access.
+
+import asyncio
+import json
+import random
+from datetime import date, timedelta
+
+import _paths  # noqa: F401
+from langchain_core.messages import AIMessageChunk, HumanMessage
+from budget_manager import ALLOWED_CATEGORIES
+from ledger import random_range
+from tool_cache import CachedTool
+
+_REPLY_WORDS = ("Certainly", "here", "is", "the", "summary", "you", "asked", "for", "your", "expenses", "and",
+                "events", "in", "that", "period", "look", "as", "follows", "total", "balance")
+
+
+class FakeChatModel:
+    """
+    A scripted chat model. After a user message it asks for a couple of tool calls; after the tool
+    results it streams a reply of `reply_tokens` tokens. It keeps no state between calls, so any number
+    of sessions can share it, like the real bound model.
+    """
+
+    def __init__(self, reply_tokens=60, first_token_delay=0.05, token_delay=0.002, tool_plan=None, seed=0):
+        self.reply_tokens = reply_tokens
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.tool_plan = tool_plan or default_tool_plan
+        self.seed = seed
+
+    def bind_tools(self, tools):
+        return self
+
+    async def astream(self, messages):
+        await asyncio.sleep(self.first_token_delay)
+        last = messages[-1]
+        if isinstance(last, HumanMessage):
+            rng = random.Random(f"{self.seed}:{last.content}")
+            calls = self.tool_plan(rng)
+            if calls:
+                yield AIMessageChunk(content="", tool_call_chunks=[
+                    {"name": name, "args": json.dumps(args), "id": f"call_{index}_{rng.getrandbits(32):08x}", "index": index}
+                    for index, (name, args) in enumerate(calls)
+                ])
+                return
+        rng = random.Random(f"{self.seed}:{len(messages)}")
+        for _ in range(self.reply_tokens):
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            yield AIMessageChunk(content=rng.choice(_REPLY_WORDS) + " ")
+
+
+def default_tool_plan(rng):
+    """Two read tools per question, and now and then a write, which the agent loop runs on its own."""
+    from_date, to_date = random_range(rng)
+    calls = [
+        (rng.choice(["get_expense_total", "get_balance", "get_expense_breakdown_by_category"]),
+         {"from_date": from_date, "to_date": to_date}),
+        ("get_events", {"start_date": from_date, "end_date": to_date}),
+    ]
+    if rng.random() < 0.1:
+        calls.append(("add_expense", {"date": from_date, "amount": 10.0, "description": "benchmark",
+                                      "category": rng.choice(ALLOWED_CATEGORIES)}))
+    return calls
+
+
+class FakeTool:
+    """An MCP tool served in-process: awaits `latency` to stand in for the SSE round trip, then calls `handler`."""
+
+    def __init__(self, name, handler, latency=0.002, read_only=True):
+        self.name = name
+        self.handler = handler
+        self.latency = latency
+        self.metadata = {"readOnlyHint": read_only}
+
+    async def ainvoke(self, input):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        result = await self.handler(**input)
+        # Results cross the wire as JSON text
+        return json.dumps(result)
+
+
+def budget_tools(manager, latency=0.002):
+    """Budget server stand-ins backed by a real AsyncBudgetManager."""
+    async def add_expense(date, amount, description, category):
+        await manager.add_record("expense", date, amount, description, category)
+        return "Expense recorded successfully."
+
+    async def get_expense_total(from_date, to_date):
+        return await manager.get_total("expense", from_date, to_date)
+
+    async def get_balance(from_date, to_date):
+        return await manager.get_balance(from_date, to_date)
+
+    async def get_expense_breakdown_by_category(from_date, to_date):
+        return await manager.get_total_breakdown_by_category("expense", from_date, to_date)
+
+    async def get_expenses(from_date, to_date, limit=50, cursor=None):
+        return await manager.page_records("expense", from_date, to_date, limit=limit, cursor=cursor)
+
+    return [
+        FakeTool("add_expense", add_expense, latency, read_only=False),
+        FakeTool("get_expense_total", get_expense_total, latency),
+        FakeTool("get_balance", get_balance, latency),
+        FakeTool("get_expense_breakdown_by_category", get_expense_breakdown_by_category, latency),
+        FakeTool("get_expenses", get_expenses, latency),
+    ]
+
+
+def calendar_tools(events_per_day=3, latency=0.005):
+    """A Calendar server stand-in returning `events_per_day` synthetic events for every day asked about."""
+    async def get_events(start_date, end_date):
+        day = date.fromisoformat(start_date)
+        last = date.fromisoformat(end_date)
+        events = []
+        while day <= last:
+            for hour in range(events_per_day):
+                events.append({
+                    "event_name": f"Meeting {hour + 1}",
+                    "event_type": "calendar#event",
+                    "calendar": "Work",
+                    "start_date": day.isoformat(),
+                    "start_time": f"{9 + hour:02d}:00",
+                    "end_date": day.isoformat(),
+                    "end_time": f"{10 + hour:02d}:00",
+                })
+            day += timedelta(days=1)
+        return events
+
+    return [FakeTool("get_events", get_events, latency)]
+
+
+class FakeConnections:
+    """Stands in for MCPConnectionManager: a fixed tool set, wrapped in the result cache like the real one."""
+
+    def __init__(self, tools, cache=None):
+        self.tools = {tool.name: CachedTool(tool, cache) if cache is not None else tool for tool in tools}
+
+    async def bind(self, model):
+        return model.bind_tools(list(self.tools.values())), self.tools
+
+    def health(self):
+        return {"fake": {"connected": True, "tools": len(self.tools), "last_error": None}}
+
+    async def close(self):
+        pass
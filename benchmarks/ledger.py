@@ -0,0 +1,57 @@
+# ledger.py
+
+import os
+import random
+import uuid
+from datetime import date, timedelta
+from typing import Dict, Iterator
+
+import _paths  # noqa: F401
+from budget_manager import ALLOWED_CATEGORIES
+from budget_storage import SQLiteStorage
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+START_DATE = date(2020, 1, 1)
+DAYS = 5 * 365
+
+_WORDS = ("coffee", "groceries", "bus", "train", "movie", "electricity", "water", "rent", "salary", "bonus",
+          "dividend", "pharmacy", "course", "books", "shoes", "gift", "dinner", "taxi", "internet", "gym")
+
+
+def synthetic_records(count: int, seed: int = 0) -> Iterator[Dict]:
+    """`count` reproducible records spread over five years, about one in ten an income."""
+    rng = random.Random(seed)
+    for _ in range(count):
+        income = rng.random() < 0.1
+        yield {
+            "record_id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "type": "income" if income else "expense",
+            "date": (START_DATE + timedelta(days=rng.randrange(DAYS))).isoformat(),
+            "amount": round(rng.uniform(500, 5000) if income else rng.lognormvariate(3, 1), 2),
+            "description": f"{rng.choice(_WORDS)} {rng.choice(_WORDS)}",
+            "category": rng.choice(ALLOWED_CATEGORIES),
+        }
+
+
+def build_ledger(count: int, seed: int = 0) -> str:
+    """Path to a SQLite ledger with `count` synthetic records, built once and reused afterwards."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f"ledger-{count}-{seed}.db")
+    if os.path.exists(path):
+        return path
+    tmp_path = path + ".building"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    storage = SQLiteStorage(tmp_path)
+    with storage.transaction():
+        for record in synthetic_records(count, seed):
+            storage.insert(record)
+    storage.close()
+    os.replace(tmp_path, path)
+    return path
+
+
+def random_range(rng: random.Random, max_days: int = 90):
+    """A random (from_date, to_date) pair of ISO dates inside the synthetic ledger's span."""
+    start = START_DATE + timedelta(days=rng.randrange(DAYS))
+    return start.isoformat(), (start + timedelta(days=rng.randrange(1, max_days))).isoformat()
@@ -0,0 +1,108 @@
+# stats.py
+
+import json
+import os
+import resource
+from typing import Dict, List, Optional
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of `values` (0 < q <= 100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(latencies: List[float], elapsed: Optional[float] = None) -> Dict[str, float]:
+    """p50/p99/max latency in milliseconds, plus throughput if the wall-clock time is given."""
+    summary = {
+        "count": len(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies, default=0.0) * 1000,
+    }
+    if elapsed:
+        summary["ops_per_s"] = len(latencies) / elapsed
+    return summary
+
+
+def rss_mb() -> float:
+    """Current resident set size, or the peak where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def baseline_path(name: str) -> str:
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def save_baseline(name: str, results: Dict[str, Dict[str, float]]):
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    with open(baseline_path(name), 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def load_baseline(name: str) -> Optional[Dict[str, Dict[str, float]]]:
+    path = baseline_path(name)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+# Metrics where a larger number is better; for everything else (latency, memory) smaller is better.
+_HIGHER_IS_BETTER = {"ops_per_s"}
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """Describe every metric that is worse than its baseline by more than `tolerance` (a fraction)."""
+    regressions = []
+    for case, metrics in results.items():
+        for metric, value in metrics.items():
+            before = baseline.get(case, {}).get(metric)
+            if not before or metric == "count":
+                continue
+            change = (value - before) / before
+            if metric in _HIGHER_IS_BETTER:
+                change = -change
+            if change > tolerance:
+                regressions.append(f"{case} {metric}: {before:.3f} -> {value:.3f} ({change:+.0%})")
+    return regressions
+
+
+def print_table(results: Dict[str, Dict[str, float]]):
+    metrics = sorted({metric for values in results.values() for metric in values})
+    width = max(len(case) for case in results)
+    print(f"{'case':<{width}}  " + "  ".join(f"{metric:>12}" for metric in metrics))
+    for case, values in results.items():
+        print(f"{case:<{width}}  " + "  ".join(
+            f"{values[metric]:>12.3f}" if metric in values else f"{'':>12}" for metric in metrics))
+
+
+def report(name: str, results: Dict[str, Dict[str, float]], save: bool = False, tolerance: float = 0.2) -> int:
+    """Print results, compare them with the stored baseline and optionally replace it. Returns an exit code."""
+    print_table(results)
+    status = 0
+    baseline = load_baseline(name)
+    if baseline is None:
+        print(f"\nNo baseline at {baseline_path(name)}; run with --save-baseline to store one.")
+    else:
+        regressions = compare(results, baseline, tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {tolerance:.0%} of the baseline:")
+            for regression in regressions:
+                print("  " + regression)
+            status = 1
+        else:
+            print(f"\nWithin {tolerance:.0%} of the baseline.")
+    if save:
+        save_baseline(name, results)
+        print(f"Baseline saved to {baseline_path(name)}.")
+    return status
@@ -0,0 +1,130 @@
+# async_budget_manager.py
+
+import asyncio
+from typing import Any, Callable, List, Optional, Tuple
+
+from budget_manager import BudgetManager
+from budget_metrics import CALL_SECONDS, WRITE_BATCH_SIZE
+
+_READ_METHODS = {
+    "query_records",
+    "find_records",
+    "page_records",
+    "get_total",
+    "get_balance",
+    "get_total_for_category",
+    "get_total_breakdown_by_category",
+    "get_allowed_categories",
+    "get_category_aliases",
+    "get_category_cache_stats",
+    "check_rollups",
+    "export_records",
+    "list_recurring",
+    "get_cash_flow_forecast",
+}
+
+_WRITE_METHODS = {
+    "add_record",
+    "edit_record",
+    "delete_record",
+    "add_category_alias",
+    "add_records",
+    "edit_records",
+    "delete_records",
+    "import_statement",
+    "add_recurring",
+    "delete_recurring",
+}
+
+
+class AsyncBudgetManager:
+    """
+    Event-loop friendly front for BudgetManager.
+
+    Reads run on a worker thread. Writes are queued to a single writer task, which drains whatever
+    is waiting and applies it as one storage transaction. Each caller's await returns only after
+    that transaction has committed, and a failing write only fails its own caller.
+    """
+
+    def __init__(self, manager: BudgetManager, max_batch: int = 256, linger: float = 0.0):
+        self.manager = manager
+        self.max_batch = max_batch
+        self.linger = linger
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+
+    def __getattr__(self, name: str) -> Callable:
+        if name in _READ_METHODS:
+            method = getattr(self.manager, name)
+            timer = CALL_SECONDS.labels(name)
+
+            async def read(*args, **kwargs):
+                with timer.time():
+                    return await asyncio.to_thread(method, *args, **kwargs)
+            return read
+        if name in _WRITE_METHODS:
+            method = getattr(self.manager, name)
+            timer = CALL_SECONDS.labels(name)
+
+            async def write(*args, **kwargs):
+                with timer.time():
+                    return await self._submit(method, *args, **kwargs)
+            return write
+        raise AttributeError(name)
+
+    async def _submit(self, method: Callable, *args, **kwargs) -> Any:
+        if self._writer is None:
+            self._queue = asyncio.Queue()
+            self._writer = asyncio.create_task(self._write_loop())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((method, args, kwargs, future))
+        return await future
+
+    async def _write_loop(self):
+        stopping = False
+        while not stopping:
+            batch = [await self._queue.get()]
+            if self.linger:
+                await asyncio.sleep(self.linger)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            if None in batch:
+                # aclose() enqueues None; everything queued before it is still written.
+                stopping = True
+                batch = [item for item in batch if item is not None]
+            if not batch:
+                continue
+
+            WRITE_BATCH_SIZE.observe(len(batch))
+            outcomes = await asyncio.to_thread(self._apply_batch, batch)
+            for (_, _, _, future), (result, error) in zip(batch, outcomes):
+                if future.cancelled():
+                    continue
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+    def _apply_batch(self, batch: List[Tuple]) -> List[Tuple[Any, Optional[BaseException]]]:
+        outcomes = []
+        try:
+            with self.manager.transaction():
+                for method, args, kwargs, _ in batch:
+                    # Each write gets its own savepoint: whatever it raises undoes only that write, not the batch.
+                    try:
+                        with self.manager.transaction():
+                            outcomes.append((method(*args, **kwargs), None))
+                    except Exception as e:
+                        outcomes.append((None, e))
+        except Exception as e:
+            # The commit itself failed, so nothing in the batch was saved.
+            return [(None, e)] * len(batch)
+        return outcomes
+
+    async def aclose(self):
+        """Wait for queued writes to commit, stop the writer and close storage."""
+        if self._writer is not None:
+            await self._queue.put(None)
+            await self._writer
+            self._writer = None
+        await asyncio.to_thread(self.manager.close)
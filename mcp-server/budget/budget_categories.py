@@ -0,0 +1,71 @@
+# budget_categories.py
+
+import difflib
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from budget_metrics import CATEGORY_CACHE_LOOKUPS
+
+_CACHE_HITS = CATEGORY_CACHE_LOOKUPS.labels("hit")
+_CACHE_MISSES = CATEGORY_CACHE_LOOKUPS.labels("miss")
+
+
+class CategoryNormalizer:
+    """
+    Maps raw category input to a canonical category.
+
+    Exact names and user-defined aliases are checked first; difflib fuzzy matching is only the
+    fallback. Results, including rejected inputs, are kept in a bounded LRU cache.
+    """
+
+    def __init__(self, allowed: Iterable[str], aliases: Optional[Dict[str, str]] = None, maxsize: int = 1024):
+        self.allowed: List[str] = list(allowed)
+        self.maxsize = maxsize
+        self._aliases: Dict[str, str] = {}
+        self._cache: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        for alias, category in (aliases or {}).items():
+            self.add_alias(alias, category)
+
+    def add_alias(self, alias: str, category: str):
+        alias = alias.lower()
+        category = category.lower()
+        if category not in self.allowed:
+            raise ValueError(f"Invalid category '{category}'. Must be one of: {', '.join(self.allowed)}")
+        if alias in self.allowed and alias != category:
+            raise ValueError(f"'{alias}' is already a category and cannot be an alias for '{category}'.")
+        self._aliases[alias] = category
+        self._cache.clear()
+
+    def aliases(self) -> Dict[str, str]:
+        return dict(self._aliases)
+
+    def _resolve(self, category: str) -> Optional[str]:
+        if category in self.allowed:
+            return category
+        if category in self._aliases:
+            return self._aliases[category]
+        matches = difflib.get_close_matches(category, self.allowed, n=1, cutoff=0.7)
+        return matches[0] if matches else None
+
+    def normalize(self, category: str) -> str:
+        category = category.lower()
+        if category in self._cache:
+            self.hits += 1
+            _CACHE_HITS.inc()
+            self._cache.move_to_end(category)
+            result = self._cache[category]
+        else:
+            self.misses += 1
+            _CACHE_MISSES.inc()
+            result = self._resolve(category)
+            self._cache[category] = result
+            if len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        if result is None:
+            raise ValueError(f"Invalid category '{category}'. Must be one of: {', '.join(self.allowed)}")
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._cache), "maxsize": self.maxsize}
@@ -0,0 +1,132 @@
+# budget_columns.py
+
+import heapq
+from datetime import datetime, timedelta
+from operator import itemgetter
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; BudgetManager falls back to the index when it is missing
+    np = None
+
+_EPOCH = datetime.min
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def columns_available() -> bool:
+    return np is not None
+
+
+def _to_int(record_dt: datetime) -> int:
+    return (record_dt - _EPOCH) // _MICROSECOND
+
+
+class ColumnarLedger:
+    """
+    Column arrays over the ledger, in date order.
+
+    Dates are int64 microseconds, amounts float64, type and category small-int codes, and
+    descriptions are interned: each distinct lowercased description is stored once and rows
+    hold its code, so substring filters only look at distinct strings.
+
+    Writes do not rebuild the arrays: removed rows are masked out and added records go to a small
+    unsorted tail that is scanned directly. Once `needs_compaction()` says the tail or the dead rows
+    have grown too large, the owner rebuilds the ledger, so the rebuild cost is spread over many writes.
+    """
+
+    def __init__(self, records: List[Dict], dates: List[datetime]):
+        self.record_ids = [record["record_id"] for record in records]
+        self.dates = np.fromiter((_to_int(record_dt) for record_dt in dates), dtype=np.int64, count=len(dates))
+        self.amounts = np.fromiter((record["amount"] for record in records), dtype=np.float64, count=len(records))
+
+        self.type_codes: Dict[str, int] = {}
+        self.category_codes: Dict[str, int] = {}
+        descriptions: Dict[str, int] = {}
+        types = np.empty(len(records), dtype=np.int8)
+        categories = np.empty(len(records), dtype=np.int16)
+        description_codes = np.empty(len(records), dtype=np.int32)
+        for i, record in enumerate(records):
+            types[i] = self.type_codes.setdefault(record["type"], len(self.type_codes))
+            categories[i] = self.category_codes.setdefault(record["category"], len(self.category_codes))
+            description_codes[i] = descriptions.setdefault(record["description"].lower(), len(descriptions))
+        self.types = types
+        self.categories = categories
+        self.description_codes = description_codes
+        self.descriptions = list(descriptions)
+        self._rows = {record_id: i for i, record_id in enumerate(self.record_ids)}
+        self._live = np.ones(len(records), dtype=bool)
+        self._dead = 0
+        self._tail: Dict[str, Tuple[Dict, datetime]] = {}
+
+    def __len__(self):
+        return len(self.record_ids)
+
+    def add(self, record: Dict, record_dt: datetime):
+        self._tail[record["record_id"]] = (record, record_dt)
+
+    def remove(self, record_id: str):
+        if self._tail.pop(record_id, None) is not None:
+            return
+        row = self._rows.pop(record_id)
+        self._live[row] = False
+        self._dead += 1
+
+    def needs_compaction(self) -> bool:
+        limit = max(1024, len(self) // 8)
+        return len(self._tail) > limit or self._dead > limit
+
+    def mask(self, record_type: Optional[str] = None, category: Optional[str] = None,
+             from_dt: Optional[datetime] = None, to_dt: Optional[datetime] = None,
+             amount: Optional[float] = None, description: Optional[str] = None):
+        """Boolean row mask for the given filters. `description` is matched as a lowercase substring."""
+        mask = self._live.copy()
+        if record_type:
+            if record_type not in self.type_codes:
+                return np.zeros(len(self), dtype=bool)
+            mask &= self.types == self.type_codes[record_type]
+        if category:
+            if category not in self.category_codes:
+                return np.zeros(len(self), dtype=bool)
+            mask &= self.categories == self.category_codes[category]
+        if from_dt is not None and to_dt is not None:
+            lo = np.searchsorted(self.dates, _to_int(from_dt), side="left")
+            hi = np.searchsorted(self.dates, _to_int(to_dt), side="right")
+            mask[:lo] = False
+            mask[hi:] = False
+        if amount:
+            mask &= self.amounts == amount
+        if description:
+            needle = description.lower()
+            matching = np.fromiter((needle in text for text in self.descriptions), dtype=bool,
+                                   count=len(self.descriptions))
+            mask &= matching[self.description_codes]
+        return mask
+
+    def select(self, mask) -> List[str]:
+        return [self.record_ids[i] for i in np.flatnonzero(mask)]
+
+    def find(self, record_type: Optional[str] = None, category: Optional[str] = None,
+             from_dt: Optional[datetime] = None, to_dt: Optional[datetime] = None,
+             amount: Optional[float] = None, description: Optional[str] = None) -> List[str]:
+        """IDs of the live records matching the filters, array rows and tail together, in date order."""
+        selected = self.select(self.mask(record_type, category, from_dt, to_dt, amount, description))
+        if not self._tail:
+            return selected
+        needle = description.lower() if description else None
+        # Ties keep insertion order, rows before tail, the same order the index gives equal dates
+        tail = sorted(
+            ((record_dt, record_id) for record_id, (record, record_dt) in self._tail.items()
+             if (not record_type or record["type"] == record_type)
+             and (not category or record["category"] == category)
+             and (from_dt is None or to_dt is None or from_dt <= record_dt <= to_dt)
+             and (not amount or record["amount"] == amount)
+             and (not needle or needle in record["description"].lower())),
+            key=itemgetter(0))
+        if not tail:
+            return selected
+        row_dates = self.dates
+        rows = self._rows
+        merged = heapq.merge(((row_dates[rows[record_id]], record_id) for record_id in selected),
+                             ((_to_int(record_dt), record_id) for record_dt, record_id in tail), key=itemgetter(0))
+        return [record_id for _, record_id in merged]
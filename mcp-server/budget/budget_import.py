@@ -0,0 +1,101 @@
+# budget_import.py
+
+import csv
+import os
+import re
+from typing import Dict, Iterable, Iterator
+
+CSV_FIELDS = ["record_id", "type", "date", "amount", "description", "category"]
+
+# The only directory statements are imported from and exported to; paths are taken relative to it
+FILES_DIR = os.environ.get("BUDGET_FILES_DIR", "statements")
+
+_OFX_FIELD = re.compile(r"<(\w+)>([^<\r\n]*)")
+
+
+def resolve_file(path: str, directory: str = FILES_DIR) -> str:
+    """The real path of `path` inside `directory`. Anything that resolves outside it, through `..` or a symlink, is rejected."""
+    root = os.path.realpath(directory)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root or resolved == root:
+        raise ValueError(f"Path '{path}' is outside the statements directory.")
+    return resolved
+
+
+def _signed_entry(date: str, amount: float, description: str, category: str, record_id=None) -> Dict:
+    """Bank statements use the sign of the amount: negative is money out, positive is money in."""
+    return {
+        "record_id": record_id,
+        "type": "expense" if amount < 0 else "income",
+        "date": date,
+        "amount": abs(amount),
+        "description": description,
+        "category": category,
+    }
+
+
+def read_csv_records(path: str, default_category: str = "other") -> Iterator[Dict]:
+    """
+    Stream entries from a CSV file with a header row.
+
+    Required columns: date, amount. Optional: description, category, type. Without a type column,
+    the sign of the amount decides between expense and income.
+    """
+    with open(path, newline='') as f:
+        for row_number, row in enumerate(csv.DictReader(f), start=2):
+            try:
+                amount = float(row["amount"])
+                date = row["date"].strip()
+            except (KeyError, TypeError, ValueError):
+                raise ValueError(f"{path}, line {row_number}: every row needs a date and a numeric amount.")
+            description = (row.get("description") or "").strip()
+            category = (row.get("category") or "").strip() or default_category
+            record_type = (row.get("type") or "").strip().lower()
+            if record_type:
+                yield {"record_id": None, "type": record_type, "date": date, "amount": amount,
+                       "description": description, "category": category}
+            else:
+                yield _signed_entry(date, amount, description, category)
+
+
+def read_ofx_records(path: str, default_category: str = "other") -> Iterator[Dict]:
+    """
+    Stream transactions from an OFX bank statement (SGML 1.x or XML 2.x), one STMTTRN block at a time.
+    The transaction's FITID becomes the record id, so importing the same statement twice is harmless.
+    """
+    with open(path, errors="replace") as f:
+        fields = None
+        for line in f:
+            upper = line.upper()
+            if "<STMTTRN>" in upper:
+                fields = {}
+            if fields is not None:
+                for tag, value in _OFX_FIELD.findall(line):
+                    fields.setdefault(tag.upper(), value.strip())
+            if "</STMTTRN>" in upper and fields is not None:
+                posted = fields.get("DTPOSTED", "")
+                try:
+                    amount = float(fields["TRNAMT"])
+                    date = f"{posted[0:4]}-{posted[4:6]}-{posted[6:8]}"
+                except (KeyError, ValueError):
+                    raise ValueError(f"{path}: transaction {fields.get('FITID', '?')} has no usable amount or date.")
+                description = fields.get("NAME") or fields.get("MEMO") or ""
+                record_id = f"ofx-{fields['FITID']}" if fields.get("FITID") else None
+                yield _signed_entry(date, amount, description, default_category, record_id)
+                fields = None
+
+
+def write_csv_records(path: str, records: Iterable[Dict]) -> int:
+    """Write records to a new CSV file. An existing file, such as a statement waiting to be imported, is never replaced."""
+    count = 0
+    try:
+        f = open(path, 'x', newline='')
+    except FileExistsError:
+        raise ValueError(f"{os.path.basename(path)} already exists. Choose a new file name.")
+    with f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+            count += 1
+    return count
@@ -0,0 +1,125 @@
+# budget_index.py
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+def parse_date(value: str) -> datetime:
+    """Parse an ISO date or datetime. Dates with a UTC offset become naive UTC, so every date in the ledger compares with every other."""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+class _DateBucket:
+    """Record ids kept sorted by their parsed date, for bisect range lookups."""
+
+    def __init__(self):
+        self.dates: List[datetime] = []
+        self.record_ids: List[str] = []
+
+    def add(self, record_dt: datetime, record_id: str):
+        pos = bisect_right(self.dates, record_dt)
+        self.dates.insert(pos, record_dt)
+        self.record_ids.insert(pos, record_id)
+
+    def remove(self, record_dt: datetime, record_id: str):
+        lo = bisect_left(self.dates, record_dt)
+        hi = bisect_right(self.dates, record_dt)
+        pos = self.record_ids.index(record_id, lo, hi)
+        del self.dates[pos]
+        del self.record_ids[pos]
+
+    def bounds(self, from_dt: Optional[datetime], to_dt: Optional[datetime]) -> Tuple[int, int]:
+        if from_dt is None or to_dt is None:
+            return 0, len(self.record_ids)
+        return bisect_left(self.dates, from_dt), bisect_right(self.dates, to_dt)
+
+    def range(self, from_dt: Optional[datetime], to_dt: Optional[datetime], reverse: bool = False) -> Iterator[str]:
+        """Ids in the range, walked in place rather than copied out, so a caller that stops early pays only for what it read."""
+        lo, hi = self.bounds(from_dt, to_dt)
+        record_ids = self.record_ids
+        return (record_ids[i] for i in (range(hi - 1, lo - 1, -1) if reverse else range(lo, hi)))
+
+    def count(self, from_dt: Optional[datetime], to_dt: Optional[datetime]) -> int:
+        lo, hi = self.bounds(from_dt, to_dt)
+        return hi - lo
+
+    def __len__(self):
+        return len(self.record_ids)
+
+
+class RecordIndex:
+    """Resident copy of the ledger, sorted by date and partitioned by type and by (type, category)."""
+
+    def __init__(self, records: Iterable[Dict] = ()):
+        self.records: Dict[str, Dict] = {}
+        self._dates: Dict[str, datetime] = {}
+        self._all = _DateBucket()
+        self._by_type: Dict[str, _DateBucket] = {}
+        self._by_type_category: Dict[Tuple[str, str], _DateBucket] = {}
+        for record in records:
+            self.add(record)
+
+    def __contains__(self, record_id: str) -> bool:
+        return record_id in self.records
+
+    def __len__(self):
+        return len(self.records)
+
+    def date_of(self, record_id: str) -> datetime:
+        return self._dates[record_id]
+
+    def ordered_ids(self) -> List[str]:
+        return self._all.record_ids
+
+    def _buckets(self, record: Dict) -> List[_DateBucket]:
+        type_bucket = self._by_type.setdefault(record["type"], _DateBucket())
+        category_bucket = self._by_type_category.setdefault((record["type"], record["category"]), _DateBucket())
+        return [self._all, type_bucket, category_bucket]
+
+    def add(self, record: Dict):
+        record_id = record["record_id"]
+        record_dt = parse_date(record["date"])
+        self.records[record_id] = record
+        self._dates[record_id] = record_dt
+        for bucket in self._buckets(record):
+            bucket.add(record_dt, record_id)
+
+    def remove(self, record_id: str) -> Dict:
+        record = self.records.pop(record_id)
+        record_dt = self._dates.pop(record_id)
+        for bucket in self._buckets(record):
+            bucket.remove(record_dt, record_id)
+        return record
+
+    def range(self, record_type: Optional[str] = None, category: Optional[str] = None,
+              from_dt: Optional[datetime] = None, to_dt: Optional[datetime] = None, reverse: bool = False) -> Iterator[Dict]:
+        """Yield records in date order, or newest first. Dates only filter when both ends are given, matching query_records."""
+        if record_type is None and category is None:
+            bucket = self._all
+        elif category is None:
+            bucket = self._by_type.get(record_type)
+        elif record_type is not None:
+            bucket = self._by_type_category.get((record_type, category))
+        else:
+            return (record for record in self.range(None, None, from_dt, to_dt, reverse) if record["category"] == category)
+        if bucket is None:
+            return iter(())
+        records = self.records
+        return (records[record_id] for record_id in bucket.range(from_dt, to_dt, reverse))
+
+    def count(self, record_type: Optional[str] = None, category: Optional[str] = None,
+              from_dt: Optional[datetime] = None, to_dt: Optional[datetime] = None) -> int:
+        """How many records `range` yields for the same arguments, from bisects alone."""
+        if record_type is None and category is None:
+            buckets = [self._all]
+        elif category is None:
+            buckets = [self._by_type.get(record_type)]
+        elif record_type is not None:
+            buckets = [self._by_type_category.get((record_type, category))]
+        else:
+            buckets = [bucket for (_, bucket_category), bucket in self._by_type_category.items() if bucket_category == category]
+        return sum(bucket.count(from_dt, to_dt) for bucket in buckets if bucket is not None)
@@ -1,12 +1,27 @@
 # budget_manager.py
 
+import base64
+import binascii
+import heapq
+import itertools
 import json
+import math
 import os
-import difflib
+import threading
 import uuid
-from datetime import datetime
-from typing import List, Dict, Optional
-from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
+
+from budget_categories import CategoryNormalizer
+from budget_columns import ColumnarLedger, columns_available
+from budget_import import read_csv_records, read_ofx_records, write_csv_records
+from budget_index import RecordIndex, parse_date
+from budget_metrics import LOAD_DATA_SECONDS
+from budget_recurrence import RecurringRule
+from budget_rollup import RollupTable
+from budget_storage import RECORD_FIELDS, open_storage, migrate_json_to_sqlite
 
 ALLOWED_CATEGORIES = [
     "food",
@@ -22,127 +37,548 @@ ALLOWED_CATEGORIES = [
     "other",
 ]
 
+RECORD_TYPES = ("expense", "income")
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def _merge_by_date(*streams: Iterable[Dict], reverse: bool = False) -> Iterator[Dict]:
+    """Merge date-ordered streams. With `reverse`, the streams run newest first and equal dates come out in exactly the reverse of the ascending merge."""
+    if reverse:
+        return heapq.merge(*reversed(streams), key=lambda record: parse_date(record["date"]), reverse=True)
+    return heapq.merge(*streams, key=lambda record: parse_date(record["date"]))
+
+
+def _encode_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset}).encode()).decode()
+
+
+def _decode_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(cursor.encode()))["offset"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor. Pass back the next_cursor value from the previous page.")
+    if not isinstance(offset, int) or offset < 0:
+        raise ValueError("Invalid cursor. Pass back the next_cursor value from the previous page.")
+    return offset
+
+
+def _synchronized(method):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
 class BudgetManager:
-    def __init__(self, filename: str = "budget_data.json"):
+    def __init__(self, filename: str = "budget_data.db", aliases: Optional[Dict[str, str]] = None):
         self.filename = filename
-        if not os.path.exists(self.filename):
-            with open(self.filename, 'w') as f:
-                json.dump([], f)
+        legacy_filename = os.path.splitext(self.filename)[0] + ".json"
+        if legacy_filename != self.filename and not os.path.exists(self.filename) and os.path.exists(legacy_filename):
+            migrate_json_to_sqlite(legacy_filename, self.filename)
+        self.storage = open_storage(self.filename)
+        self.categories = CategoryNormalizer(ALLOWED_CATEGORIES, {**self.storage.load_aliases(), **(aliases or {})})
+        self._lock = threading.RLock()
+        # Bumped before every in-memory change, so a failed transaction knows whether it left anything to undo
+        self._changes = 0
+        self._build_indexes()
 
+    @LOAD_DATA_SECONDS.time()
     def _load_data(self) -> List[Dict]:
-        with open(self.filename, 'r') as f:
-            return json.load(f)
+        return self.storage.load_all()
+
+    def _build_indexes(self):
+        self.index = RecordIndex(self._load_data())
+        self.rules: Dict[str, RecurringRule] = {rule["rule_id"]: RecurringRule(rule) for rule in self.storage.load_rules()}
+        self.rollups = RollupTable((record, self.index.date_of(record_id)) for record_id, record in self.index.records.items())
+        self._columns: Optional[ColumnarLedger] = None
+
+    @_synchronized
+    def close(self):
+        self.storage.close()
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Group several writes into one storage commit. Other threads wait until the block ends.
+        If the block fails after changing the in-memory indexes, they are rebuilt from storage so they never
+        show unsaved writes. A write rejected before it touched them (a bad category, an unknown ID) costs no rebuild.
+        """
+        with self._lock:
+            changes = self._changes
+            try:
+                with self.storage.transaction():
+                    yield
+            except BaseException:
+                if self._changes != changes:
+                    self._build_indexes()
+                raise
+
+    def _get_columns(self) -> Optional[ColumnarLedger]:
+        """Columnar view of the ledger, built on first use and after compaction. None when numpy is not installed."""
+        if self._columns is None and columns_available():
+            ordered_ids = self.index.ordered_ids()
+            self._columns = ColumnarLedger([self.index.records[record_id] for record_id in ordered_ids],
+                                           [self.index.date_of(record_id) for record_id in ordered_ids])
+        return self._columns
+
+    def _index_add(self, record: Dict):
+        self._changes += 1
+        self.index.add(record)
+        record_dt = self.index.date_of(record["record_id"])
+        self.rollups.add(record, record_dt)
+        if self._columns is not None:
+            self._columns.add(record, record_dt)
+            self._compact_columns()
+
+    def _index_remove(self, record_id: str):
+        self._changes += 1
+        record_dt = self.index.date_of(record_id)
+        record = self.index.remove(record_id)
+        self.rollups.remove(record, record_dt)
+        if self._columns is not None:
+            self._columns.remove(record_id)
+            self._compact_columns()
 
-    def _save_data(self, data: List[Dict]):
-        with open(self.filename, 'w') as f:
-            json.dump(data, f, indent=2)
+    def _compact_columns(self):
+        # Dropped here and rebuilt lazily by the next search that needs it
+        if self._columns.needs_compaction():
+            self._columns = None
+
+    @staticmethod
+    def _parse_range(from_date: Optional[str], to_date: Optional[str]) -> Tuple[Optional[datetime], Optional[datetime]]:
+        if from_date and to_date:
+            return parse_date(from_date), parse_date(to_date)
+        return None, None
+
+    @staticmethod
+    def _rule_range(from_dt: Optional[datetime], to_dt: Optional[datetime]) -> Tuple[datetime, datetime]:
+        # Without a date range, recurring rules contribute the occurrences up to now, not their whole future.
+        if from_dt is None or to_dt is None:
+            return datetime.min, datetime.now()
+        return from_dt, to_dt
+
+    def _rules_total(self, record_type: Optional[str], category: Optional[str],
+                     from_dt: Optional[datetime], to_dt: Optional[datetime]) -> float:
+        from_dt, to_dt = self._rule_range(from_dt, to_dt)
+        return sum((rule.total(from_dt, to_dt) for rule in self.rules.values() if rule.matches(record_type, category)), 0.0)
+
+    def _occurrences(self, record_type: Optional[str], category: Optional[str],
+                     from_dt: Optional[datetime], to_dt: Optional[datetime], reverse: bool = False) -> Iterator[Dict]:
+        """Occurrences of the matching rules in the range, in date order, expanded only as far as the range reaches."""
+        from_dt, to_dt = self._rule_range(from_dt, to_dt)
+        streams = [rule.records(from_dt, to_dt, reverse) for rule in self.rules.values() if rule.matches(record_type, category)]
+        return _merge_by_date(*streams, reverse=reverse)
+
+    def _occurrence_count(self, record_type: Optional[str], category: Optional[str],
+                          from_dt: Optional[datetime], to_dt: Optional[datetime]) -> int:
+        from_dt, to_dt = self._rule_range(from_dt, to_dt)
+        return sum(rule.count(from_dt, to_dt) for rule in self.rules.values() if rule.matches(record_type, category))
+
+    def _with_occurrences(self, records: Iterator[Dict], record_type: Optional[str], category: Optional[str],
+                          from_dt: Optional[datetime], to_dt: Optional[datetime]) -> Iterator[Dict]:
+        if not self.rules:
+            return records
+        return _merge_by_date(records, self._occurrences(record_type, category, from_dt, to_dt))
 
     def _normalize_category(self, category: str) -> str:
-        category = category.lower()
-        matches = difflib.get_close_matches(category, ALLOWED_CATEGORIES, n=1, cutoff=0.7)
-        if matches:
-            return matches[0]
-        raise ValueError(f"Invalid category '{category}'. Must be one of: {', '.join(ALLOWED_CATEGORIES)}")
+        return self.categories.normalize(category)
 
-    def add_record(self, record_type: str, date: str, amount: float, description: str, category: str):
+    @_synchronized
+    def add_category_alias(self, alias: str, category: str):
+        self.categories.add_alias(alias, category)
+        self.storage.save_alias(alias.lower(), category.lower())
+
+    @_synchronized
+    def get_category_aliases(self) -> Dict[str, str]:
+        return self.categories.aliases()
+
+    @_synchronized
+    def get_category_cache_stats(self) -> Dict[str, int]:
+        return self.categories.stats()
+
+    @staticmethod
+    def _check_type_and_amount(record_type: str, amount) -> float:
+        """Validate the record type and return the amount as a float, so the rollups and sorts only ever see numbers."""
+        if record_type not in RECORD_TYPES:
+            raise ValueError(f"Invalid type '{record_type}'. Must be one of: {', '.join(RECORD_TYPES)}")
+        try:
+            amount = float(amount)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid amount '{amount}'. Must be a number.")
+        if not math.isfinite(amount):
+            raise ValueError(f"Invalid amount '{amount}'. Must be a finite number.")
+        return amount
+
+    def _build_record(self, record_type: str, date: str, amount: float, description: str, category: str,
+                      record_id: Optional[str] = None) -> Dict:
+        amount = self._check_type_and_amount(record_type, amount)
         category = self._normalize_category(category)
-        data = self._load_data()
-        record = {
-            "record_id": str(uuid.uuid4()),
+        # Reject bad dates before anything is written, and store dates with a UTC offset as naive UTC
+        if datetime.fromisoformat(date).tzinfo is not None:
+            date = parse_date(date).isoformat()
+        return {
+            "record_id": record_id or str(uuid.uuid4()),
             "type": record_type,
             "date": date,
             "amount": amount,
-            "description": description,
+            "description": description or "",
             "category": category
         }
-        data.append(record)
-        self._save_data(data)
 
+    # Single writes also run in a transaction: if the in-memory update fails, the storage write is rolled back with it.
+    @_synchronized
+    def add_record(self, record_type: str, date: str, amount: float, description: str, category: str):
+        record = self._build_record(record_type, date, amount, description, category)
+        with self.transaction():
+            self.storage.insert(record)
+            self._index_add(record)
+
+    def _occurrence_rule(self, record_id: str) -> Optional[str]:
+        """The rule ID if `record_id` names an occurrence of a recurring rule ("<rule_id>@<date>"), else None."""
+        rule_id, at, _ = str(record_id).partition("@")
+        return rule_id if at and rule_id in self.rules else None
+
+    def _not_found(self, record_id: str) -> str:
+        """Why `record_id` can't be edited or deleted; occurrences are pointed at their rule."""
+        rule_id = self._occurrence_rule(record_id)
+        if rule_id is not None:
+            return (f"'{record_id}' is an occurrence of recurring rule {rule_id}, not a stored record, and cannot be "
+                    f"edited or deleted on its own. Use delete_recurring with rule ID {rule_id} to stop the rule.")
+        return "Record ID not found."
+
+    @_synchronized
     def edit_record(self, record_id: str, record_type: str, date: str, amount: float, description: str, category: str):
-        category = self._normalize_category(category)
-        data = self._load_data()
-        for record in data:
-            if record.get("record_id") == record_id:
-                record.update({
-                    "type": record_type,
-                    "date": date,
-                    "amount": amount,
-                    "description": description,
-                    "category": category
-                })
-                self._save_data(data)
-                return
-        raise ValueError("Record ID not found.")
+        record = self._build_record(record_type, date, amount, description, category, record_id)
+        if record_id not in self.index:
+            raise ValueError(self._not_found(record_id))
+        with self.transaction():
+            self.storage.update(record)
+            self._index_remove(record_id)
+            self._index_add(record)
 
+    @_synchronized
     def delete_record(self, record_id: str):
-        data = self._load_data()
-        new_data = [record for record in data if record.get("record_id") != record_id]
-        if len(new_data) == len(data):
-            raise ValueError("Record ID not found.")
-        self._save_data(new_data)
+        if record_id not in self.index:
+            raise ValueError(self._not_found(record_id))
+        with self.transaction():
+            self.storage.delete(record_id)
+            self._index_remove(record_id)
+
+    def _record_from_entry(self, entry: Dict, position: int, record_id: Optional[str] = None) -> Dict:
+        try:
+            return self._build_record(entry["type"], entry["date"], entry["amount"], entry.get("description", ""),
+                                      entry["category"], record_id)
+        except KeyError as e:
+            raise ValueError(f"Record {position}: missing field {e}.")
+        except ValueError as e:
+            raise ValueError(f"Record {position}: {e}")
 
+    @_synchronized
+    def add_records(self, entries: List[Dict]) -> List[str]:
+        """Add many records in one transaction; nothing is saved unless every entry is valid. Returns the new IDs."""
+        records = [self._record_from_entry(entry, i) for i, entry in enumerate(entries)]
+        with self.transaction():
+            for record in records:
+                self.storage.insert(record)
+                self._index_add(record)
+        return [record["record_id"] for record in records]
+
+    @_synchronized
+    def edit_records(self, entries: List[Dict]):
+        """Edit many records in one transaction. Each entry carries its record_id plus the full new contents."""
+        records = []
+        for i, entry in enumerate(entries):
+            record_id = entry.get("record_id")
+            if record_id not in self.index:
+                raise ValueError(f"Record {i}: {self._not_found(record_id)}")
+            records.append(self._record_from_entry(entry, i, record_id))
+        if len({record["record_id"] for record in records}) != len(records):
+            raise ValueError("The same record ID appears more than once.")
+        with self.transaction():
+            for record in records:
+                self.storage.update(record)
+                self._index_remove(record["record_id"])
+                self._index_add(record)
+
+    @_synchronized
+    def delete_records(self, record_ids: List[str]) -> int:
+        record_ids = list(dict.fromkeys(record_ids))
+        missing = [record_id for record_id in record_ids if record_id not in self.index]
+        if missing:
+            occurrences = [record_id for record_id in missing if self._occurrence_rule(record_id) is not None]
+            if occurrences:
+                raise ValueError(self._not_found(occurrences[0]))
+            raise ValueError(f"Record ID not found: {', '.join(missing)}")
+        with self.transaction():
+            for record_id in record_ids:
+                self.storage.delete(record_id)
+                self._index_remove(record_id)
+        return len(record_ids)
+
+    @_synchronized
+    def import_statement(self, path: str, file_format: str = "csv", default_category: str = "other") -> Dict[str, int]:
+        """
+        Stream a CSV or OFX bank statement into the ledger as one transaction; a bad row rolls back the whole import.
+        Entries whose ID is already in the ledger (re-imported OFX transactions) are skipped.
+        """
+        readers = {"csv": read_csv_records, "ofx": read_ofx_records}
+        if file_format.lower() not in readers:
+            raise ValueError(f"Unsupported format '{file_format}'. Must be one of: {', '.join(readers)}")
+        imported = skipped = 0
+        with self.transaction():
+            for i, entry in enumerate(readers[file_format.lower()](path, default_category)):
+                if entry["record_id"] and entry["record_id"] in self.index:
+                    skipped += 1
+                    continue
+                record = self._record_from_entry(entry, i, entry["record_id"])
+                self.storage.insert(record)
+                self._index_add(record)
+                imported += 1
+        return {"imported": imported, "skipped": skipped}
+
+    @_synchronized
+    def export_records(self, path: str, record_type: Optional[str] = None, from_date: Optional[str] = None,
+                       to_date: Optional[str] = None) -> int:
+        from_dt, to_dt = self._parse_range(from_date, to_date)
+        return write_csv_records(path, self.index.range(record_type or None, None, from_dt, to_dt))
+
+    @_synchronized
     def query_records(self, record_type: Optional[str], from_date: Optional[str] = None, to_date: Optional[str] = None) -> List[Dict]:
-        data = self._load_data()
-        results = []
-        for record in data:
-            record_dt = datetime.fromisoformat(record["date"])
-            if record_type is None or record["type"] == record_type:
-                if from_date and to_date:
-                    from_dt = datetime.fromisoformat(from_date)
-                    to_dt = datetime.fromisoformat(to_date)
-                    if from_dt <= record_dt <= to_dt:
-                        results.append(record)
-                else:
-                    results.append(record)
-        return results
+        """Stored records plus occurrences of recurring rules; the latter carry a "rule_id"."""
+        from_dt, to_dt = self._parse_range(from_date, to_date)
+        records = self._with_occurrences(self.index.range(record_type, None, from_dt, to_dt), record_type, None, from_dt, to_dt)
+        return [dict(record) for record in records]
 
-    def find_records(self, record_type: Optional[str] = None, from_date: Optional[str] = None, to_date: Optional[str] = None,
-                     amount: Optional[float] = None, description: Optional[str] = None, category: Optional[str] = None) -> List[Dict]:
-        data = self._load_data()
+    def _matching_records(self, record_type: Optional[str], from_date: Optional[str], to_date: Optional[str],
+                          amount: Optional[float], description: Optional[str], category: Optional[str]) -> List[Dict]:
+        """Stored records (not copies) matching the find_records filters, in date order."""
+        from_dt, to_dt = self._parse_range(from_date, to_date)
+        normalized_category = None
+        if category:
+            try:
+                normalized_category = self._normalize_category(category)
+            except ValueError:
+                return []
+        # The index narrows by date range, type and category on its own; the columns only pay off
+        # for amount or description searches over the whole ledger.
+        columns = self._get_columns() if (amount or description) and from_dt is None else None
+        if columns is not None:
+            ids = columns.find(record_type, normalized_category, from_dt, to_dt, amount, description)
+            return [self.index.records[record_id] for record_id in ids]
+
+        description = description.lower() if description else None
         results = []
-        for record in data:
-            record_dt = datetime.fromisoformat(record["date"])
-            if record_type and record["type"] != record_type:
-                continue
-            if from_date and to_date:
-                from_dt = datetime.fromisoformat(from_date)
-                to_dt = datetime.fromisoformat(to_date)
-                if not (from_dt <= record_dt <= to_dt):
-                    continue
+        for record in self.index.range(record_type or None, normalized_category, from_dt, to_dt):
             if amount and record["amount"] != amount:
                 continue
-            if description and description.lower() not in record["description"].lower():
+            if description and description not in record["description"].lower():
                 continue
-            if category:
-                try:
-                    normalized_category = self._normalize_category(category)
-                    if record["category"] != normalized_category:
-                        continue
-                except ValueError:
-                    continue
             results.append(record)
         return results
 
+    def _matching_occurrences(self, record_type: Optional[str], from_date: Optional[str], to_date: Optional[str],
+                              amount: Optional[float], description: Optional[str], category: Optional[str]) -> List[Dict]:
+        """Recurring occurrences matching the find_records filters, in date order."""
+        normalized_category = None
+        if category:
+            try:
+                normalized_category = self._normalize_category(category)
+            except ValueError:
+                return []
+        description = description.lower() if description else None
+        return [record for record in self._occurrences(record_type or None, normalized_category, *self._parse_range(from_date, to_date))
+                if not (amount and record["amount"] != amount)
+                and not (description and description not in record["description"].lower())]
+
+    @_synchronized
+    def find_records(self, record_type: Optional[str] = None, from_date: Optional[str] = None, to_date: Optional[str] = None,
+                     amount: Optional[float] = None, description: Optional[str] = None, category: Optional[str] = None) -> List[Dict]:
+        return [dict(record) for record in self._matching_records(record_type, from_date, to_date, amount, description, category)]
+
+    @_synchronized
+    def page_records(self, record_type: Optional[str] = None, from_date: Optional[str] = None, to_date: Optional[str] = None,
+                     amount: Optional[float] = None, description: Optional[str] = None, category: Optional[str] = None,
+                     limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, fields: Optional[List[str]] = None,
+                     sort_by: str = "date", descending: bool = False) -> Dict:
+        """
+        One page of find_records results: {"records": [...], "total": <matches>, "next_cursor": <str or None>}.
+        Pass next_cursor back to get the following page. `fields` limits which keys each record carries.
+        """
+        if sort_by not in RECORD_FIELDS:
+            raise ValueError(f"Invalid sort field '{sort_by}'. Must be one of: {', '.join(RECORD_FIELDS)}")
+        if fields:
+            unknown = [field for field in fields if field not in RECORD_FIELDS]
+            if unknown:
+                raise ValueError(f"Invalid field(s) {', '.join(unknown)}. Must be among: {', '.join(RECORD_FIELDS)}")
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        offset = _decode_cursor(cursor)
+
+        if sort_by == "date":
+            # Already in date order: walk the matches lazily up to the end of the page
+            matches, total = self._date_ordered_matches(record_type, from_date, to_date, amount, description, category, descending)
+            page = list(itertools.islice(matches, offset, offset + limit))
+        else:
+            records = self._matching_records(record_type, from_date, to_date, amount, description, category)
+            if self.rules:
+                occurrences = self._matching_occurrences(record_type, from_date, to_date, amount, description, category)
+                records = list(_merge_by_date(records, occurrences))
+            records.sort(key=lambda record: record[sort_by], reverse=descending)
+            page = records[offset:offset + limit]
+            total = len(records)
+
+        next_offset = offset + len(page)
+        return {
+            "records": [{field: record[field] for field in fields} if fields else dict(record) for record in page],
+            "total": total,
+            "next_cursor": _encode_cursor(next_offset) if next_offset < total else None,
+        }
+
+    def _date_ordered_matches(self, record_type: Optional[str], from_date: Optional[str], to_date: Optional[str],
+                              amount: Optional[float], description: Optional[str], category: Optional[str],
+                              descending: bool) -> Tuple[Iterator[Dict], int]:
+        """
+        (records and occurrences matching the filters in date order, how many there are). Type, category and
+        date filters map straight onto index buckets, so then the count comes from bisects and nothing is listed.
+        """
+        if amount or description:
+            records = self._matching_records(record_type, from_date, to_date, amount, description, category)
+            occurrences = self._matching_occurrences(record_type, from_date, to_date, amount, description, category) if self.rules else []
+            if descending:
+                return _merge_by_date(reversed(records), reversed(occurrences), reverse=True), len(records) + len(occurrences)
+            return _merge_by_date(records, occurrences), len(records) + len(occurrences)
+
+        from_dt, to_dt = self._parse_range(from_date, to_date)
+        record_type = record_type or None
+        normalized_category = None
+        if category:
+            try:
+                normalized_category = self._normalize_category(category)
+            except ValueError:
+                return iter(()), 0
+        records = self.index.range(record_type, normalized_category, from_dt, to_dt, reverse=descending)
+        total = self.index.count(record_type, normalized_category, from_dt, to_dt)
+        if not self.rules:
+            return records, total
+        occurrences = self._occurrences(record_type, normalized_category, from_dt, to_dt, reverse=descending)
+        total += self._occurrence_count(record_type, normalized_category, from_dt, to_dt)
+        return _merge_by_date(records, occurrences, reverse=descending), total
+
+    @_synchronized
     def get_total(self, record_type: str, from_date: Optional[str] = None, to_date: Optional[str] = None) -> float:
-        records = self.query_records(record_type, from_date, to_date)
-        return sum(record["amount"] for record in records)
+        from_dt, to_dt = self._parse_range(from_date, to_date)
+        return self.rollups.total(record_type, None, from_dt, to_dt) + self._rules_total(record_type, None, from_dt, to_dt)
 
+    @_synchronized
     def get_balance(self, from_date: Optional[str] = None, to_date: Optional[str] = None) -> float:
-        income = self.get_total("income", from_date, to_date)
-        expense = self.get_total("expense", from_date, to_date)
-        return income - expense
+        return self.get_total("income", from_date, to_date) - self.get_total("expense", from_date, to_date)
 
+    @_synchronized
     def get_total_for_category(self, record_type: str, from_date: Optional[str], to_date: Optional[str], category: str) -> float:
         normalized_category = self._normalize_category(category)
-        records = self.query_records(record_type, from_date, to_date)
-        return sum(record["amount"] for record in records if record["category"] == normalized_category)
+        from_dt, to_dt = self._parse_range(from_date, to_date)
+        return (self.rollups.total(record_type, normalized_category, from_dt, to_dt)
+                + self._rules_total(record_type, normalized_category, from_dt, to_dt))
 
+    @_synchronized
     def get_total_breakdown_by_category(self, record_type: str, from_date: Optional[str], to_date: Optional[str]) -> Dict[str, float]:
-        records = self.query_records(record_type, from_date, to_date)
-        category_totals = defaultdict(float)
-        for record in records:
-            category_totals[record["category"]] += record["amount"]
-        return dict(category_totals)
+        from_dt, to_dt = self._parse_range(from_date, to_date)
+        totals = self.rollups.breakdown(record_type, from_dt, to_dt)
+        rule_from_dt, rule_to_dt = self._rule_range(from_dt, to_dt)
+        for rule in self.rules.values():
+            if rule.matches(record_type, None) and rule.count(rule_from_dt, rule_to_dt):
+                category = rule.rule["category"]
+                totals[category] = totals.get(category, 0.0) + rule.total(rule_from_dt, rule_to_dt)
+        return totals
+
+    @_synchronized
+    def add_recurring(self, record_type: str, amount: float, description: str, category: str, frequency: str,
+                      start_date: str, interval: int = 1, end_date: Optional[str] = None) -> str:
+        """Add a rule such as rent on the 1st of every month. Its occurrences are computed on demand, never stored. Returns the rule ID."""
+        rule = {
+            "rule_id": str(uuid.uuid4()),
+            "type": record_type,
+            "amount": self._check_type_and_amount(record_type, amount),
+            "description": description or "",
+            "category": self._normalize_category(category),
+            "frequency": frequency.lower(),
+            "interval": interval,
+            "start_date": start_date,
+            "end_date": end_date or None,
+        }
+        recurring = RecurringRule(rule)
+        self.storage.save_rule(rule)
+        self._changes += 1
+        self.rules[rule["rule_id"]] = recurring
+        return rule["rule_id"]
+
+    @_synchronized
+    def list_recurring(self, record_type: Optional[str] = None) -> List[Dict]:
+        rules = [dict(rule.rule) for rule in self.rules.values() if rule.matches(record_type, None)]
+        return sorted(rules, key=lambda rule: rule["start_date"])
+
+    @_synchronized
+    def delete_recurring(self, rule_id: str):
+        if rule_id not in self.rules:
+            raise ValueError("Recurring rule ID not found.")
+        self.storage.delete_rule(rule_id)
+        self._changes += 1
+        del self.rules[rule_id]
+
+    @_synchronized
+    def get_cash_flow_forecast(self, from_date: str, to_date: str, history_days: int = 90) -> Dict:
+        """
+        Projected income, expenses and net per month between two dates. Recurring rules count exactly;
+        one-off records are projected at their daily average over the `history_days` before the forecast
+        starts (or before today, for a forecast of the future). Every figure comes from the rollups and
+        rule arithmetic, so the cost does not grow with the ledger or the length of the forecast.
+        """
+        from_dt, to_dt = parse_date(from_date), parse_date(to_date)
+        if to_dt < from_dt:
+            raise ValueError("End date is before the start date.")
+        if history_days < 1:
+            raise ValueError("History must cover at least one day.")
+        history_end = min(from_dt, datetime.now())
+        history = (history_end - timedelta(days=history_days), history_end - timedelta(microseconds=1))
+        daily = {record_type: self.rollups.total(record_type, None, *history) / history_days for record_type in ("income", "expense")}
+
+        months = []
+        period_start = from_dt
+        while period_start <= to_dt:
+            next_month = (period_start.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            period_end = min(to_dt, next_month - timedelta(microseconds=1))
+            days = (period_end.date() - period_start.date()).days + 1
+            month = {"month": period_start.strftime("%Y-%m")}
+            for record_type in ("income", "expense"):
+                month[f"recurring_{record_type}"] = round(self._rules_total(record_type, None, period_start, period_end), 2)
+                month[f"one_off_{record_type}"] = round(daily[record_type] * days, 2)
+            month["net"] = round(month["recurring_income"] + month["one_off_income"]
+                                 - month["recurring_expense"] - month["one_off_expense"], 2)
+            months.append(month)
+            period_start = next_month
+
+        before = (datetime.min, from_dt - timedelta(microseconds=1))
+        opening_balance = sum(sign * (self.rollups.total(record_type, None, *before) + self._rules_total(record_type, None, *before))
+                              for record_type, sign in (("income", 1), ("expense", -1)))
+        net = sum(month["net"] for month in months)
+        return {
+            "months": months,
+            "income": round(sum(month["recurring_income"] + month["one_off_income"] for month in months), 2),
+            "expense": round(sum(month["recurring_expense"] + month["one_off_expense"] for month in months), 2),
+            "net": round(net, 2),
+            "opening_balance": round(opening_balance, 2),
+            "closing_balance": round(opening_balance + net, 2),
+        }
+
+    @_synchronized
+    def check_rollups(self) -> List[str]:
+        """Recompute the rollups from storage and list every slot where the live table disagrees. Empty means consistent."""
+        fresh = RollupTable((record, parse_date(record["date"])) for record in self._load_data())
+        return self.rollups.diff(fresh)
 
     def get_allowed_categories(self) -> List[str]:
         return ALLOWED_CATEGORIES
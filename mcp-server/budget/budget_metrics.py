@@ -0,0 +1,15 @@
+# budget_metrics.py
+
+from prometheus_client import Counter, Histogram
+
+# Prometheus' default buckets start at 5ms; ledger reads and commits are often faster than that.
+_FAST_BUCKETS = (.0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+LOAD_DATA_SECONDS = Histogram("budget_load_data_seconds", "Time to read the whole ledger from storage", buckets=_FAST_BUCKETS)
+SAVE_DATA_SECONDS = Histogram("budget_save_data_seconds", "Time to durably write committed changes", ["backend"], buckets=_FAST_BUCKETS)
+CALL_SECONDS = Histogram("budget_call_seconds", "Time for a BudgetManager call, including time queued behind other writes",
+                         ["method"], buckets=_FAST_BUCKETS)
+WRITE_BATCH_SIZE = Histogram("budget_write_batch_size", "Writes committed together in one transaction",
+                             buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+CATEGORY_CACHE_LOOKUPS = Counter("budget_category_cache_lookups", "Category normalizations, by whether the LRU cache answered them",
+                                 ["result"])
@@ -0,0 +1,120 @@
+# budget_recurrence.py
+
+import calendar
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, Optional
+
+from budget_index import parse_date
+
+RULE_FIELDS = ("rule_id", "type", "amount", "description", "category", "frequency", "interval", "start_date", "end_date")
+
+# Length of one step, as (days, months)
+FREQUENCIES = {
+    "daily": (1, 0),
+    "weekly": (7, 0),
+    "monthly": (0, 1),
+    "yearly": (0, 12),
+}
+
+
+def _add_months(start: datetime, months: int) -> datetime:
+    """`start` moved by whole months, with the day clamped to the end of shorter months (Jan 31 -> Feb 28)."""
+    month_index = start.month - 1 + months
+    year, month = start.year + month_index // 12, month_index % 12 + 1
+    return start.replace(year=year, month=month, day=min(start.day, calendar.monthrange(year, month)[1]))
+
+
+class RecurringRule:
+    """
+    A record that repeats every `interval` days/weeks/months/years from `start`, until `end` if given.
+
+    Occurrences are never stored. The n-th one is computed directly, so finding the occurrences in a
+    range, or counting them, costs the same whether the rule has run for a month or for decades.
+    """
+
+    def __init__(self, rule: Dict):
+        if rule["frequency"] not in FREQUENCIES:
+            raise ValueError(f"Invalid frequency '{rule['frequency']}'. Must be one of: {', '.join(FREQUENCIES)}")
+        if int(rule["interval"]) < 1:
+            raise ValueError("Interval must be at least 1.")
+        self.rule = rule
+        self.start = parse_date(rule["start_date"])
+        self.end = None
+        if rule.get("end_date"):
+            self.end = parse_date(rule["end_date"])
+            # A date without a time includes that whole day, so a rule starting at 09:00 still runs on its last day
+            if len(rule["end_date"]) <= 10:
+                self.end += timedelta(days=1, microseconds=-1)
+        if self.end is not None and self.end < self.start:
+            raise ValueError("End date is before the start date.")
+        days, months = FREQUENCIES[rule["frequency"]]
+        self._step_days = days * int(rule["interval"])
+        self._step_months = months * int(rule["interval"])
+
+    def occurrence(self, n: int) -> datetime:
+        if self._step_months:
+            return _add_months(self.start, n * self._step_months)
+        return self.start + timedelta(days=n * self._step_days)
+
+    def _estimate(self, moment: datetime) -> int:
+        """An occurrence index at or near `moment`, off by at most one step."""
+        if self._step_months:
+            months = (moment.year - self.start.year) * 12 + moment.month - self.start.month
+            return max(0, months // self._step_months)
+        return max(0, (moment - self.start).days // self._step_days)
+
+    def _first_at_or_after(self, moment: datetime) -> int:
+        n = self._estimate(moment)
+        while self.occurrence(n) < moment:
+            n += 1
+        while n > 0 and self.occurrence(n - 1) >= moment:
+            n -= 1
+        return n
+
+    def _last_at_or_before(self, moment: datetime) -> int:
+        """Index of the last occurrence not after `moment`; -1 if there is none."""
+        if moment < self.start:
+            return -1
+        n = self._estimate(moment)
+        while self.occurrence(n) > moment:
+            n -= 1
+        while self.occurrence(n + 1) <= moment:
+            n += 1
+        return n
+
+    def _bounds(self, from_dt: datetime, to_dt: datetime):
+        if self.end is not None:
+            to_dt = min(to_dt, self.end)
+        return self._first_at_or_after(max(from_dt, self.start)), self._last_at_or_before(to_dt)
+
+    def count(self, from_dt: datetime, to_dt: datetime) -> int:
+        """Occurrences in [from_dt, to_dt]."""
+        first, last = self._bounds(from_dt, to_dt)
+        return max(0, last - first + 1)
+
+    def total(self, from_dt: datetime, to_dt: datetime) -> float:
+        return self.count(from_dt, to_dt) * self.rule["amount"]
+
+    def dates(self, from_dt: datetime, to_dt: datetime, reverse: bool = False) -> Iterator[datetime]:
+        first, last = self._bounds(from_dt, to_dt)
+        return (self.occurrence(n) for n in (range(last, first - 1, -1) if reverse else range(first, last + 1)))
+
+    def records(self, from_dt: datetime, to_dt: datetime, reverse: bool = False) -> Iterator[Dict]:
+        """The occurrences in [from_dt, to_dt] as ordinary records, tagged with the rule that produced them."""
+        rule = self.rule
+        # Dates come out in the same form the rule's start date was given in
+        with_time = len(rule["start_date"]) > 10
+        for occurrence_dt in self.dates(from_dt, to_dt, reverse):
+            date = occurrence_dt.isoformat() if with_time else occurrence_dt.date().isoformat()
+            yield {
+                "record_id": f"{rule['rule_id']}@{date}",
+                "type": rule["type"],
+                "date": date,
+                "amount": rule["amount"],
+                "description": rule["description"],
+                "category": rule["category"],
+                "rule_id": rule["rule_id"],
+            }
+
+    def matches(self, record_type: Optional[str], category: Optional[str]) -> bool:
+        return (not record_type or self.rule["type"] == record_type) and (not category or self.rule["category"] == category)
@@ -0,0 +1,116 @@
+# budget_rollup.py
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_TOLERANCE = 1e-6
+
+
+class _Series:
+    """Amount and record count per distinct date, with prefix sums rebuilt lazily after a change."""
+
+    def __init__(self):
+        self.dates: List[datetime] = []
+        self.sums: List[float] = []
+        self.counts: List[int] = []
+        self._sum_prefix: Optional[List[float]] = None
+        self._count_prefix: Optional[List[int]] = None
+
+    def add(self, record_dt: datetime, amount: float):
+        pos = bisect_left(self.dates, record_dt)
+        if pos < len(self.dates) and self.dates[pos] == record_dt:
+            self.sums[pos] += amount
+            self.counts[pos] += 1
+        else:
+            self.dates.insert(pos, record_dt)
+            self.sums.insert(pos, amount)
+            self.counts.insert(pos, 1)
+        self._sum_prefix = self._count_prefix = None
+
+    def subtract(self, record_dt: datetime, amount: float):
+        pos = bisect_left(self.dates, record_dt)
+        if self.counts[pos] == 1:
+            del self.dates[pos]
+            del self.sums[pos]
+            del self.counts[pos]
+        else:
+            self.sums[pos] -= amount
+            self.counts[pos] -= 1
+        self._sum_prefix = self._count_prefix = None
+
+    def _bounds(self, from_dt: Optional[datetime], to_dt: Optional[datetime]) -> Tuple[int, int]:
+        if from_dt is None or to_dt is None:
+            return 0, len(self.dates)
+        return bisect_left(self.dates, from_dt), bisect_right(self.dates, to_dt)
+
+    def total(self, from_dt: Optional[datetime], to_dt: Optional[datetime]) -> Tuple[float, int]:
+        if self._sum_prefix is None:
+            self._sum_prefix = list(accumulate(self.sums, initial=0.0))
+            self._count_prefix = list(accumulate(self.counts, initial=0))
+        lo, hi = self._bounds(from_dt, to_dt)
+        if hi <= lo:
+            return 0.0, 0
+        return self._sum_prefix[hi] - self._sum_prefix[lo], self._count_prefix[hi] - self._count_prefix[lo]
+
+
+class RollupTable:
+    """
+    Running totals keyed by (type, category, date), plus one series per type across all categories.
+
+    Records that carry only a date roll up per day; a record with a time of day gets its own slot,
+    so range totals keep the exact datetime semantics of query_records.
+    """
+
+    def __init__(self, records: Iterable[Tuple[Dict, datetime]] = ()):
+        self._series: Dict[Tuple[str, Optional[str]], _Series] = {}
+        for record, record_dt in records:
+            self.add(record, record_dt)
+
+    def _keys(self, record: Dict) -> List[Tuple[str, Optional[str]]]:
+        return [(record["type"], None), (record["type"], record["category"])]
+
+    def add(self, record: Dict, record_dt: datetime):
+        for key in self._keys(record):
+            self._series.setdefault(key, _Series()).add(record_dt, record["amount"])
+
+    def remove(self, record: Dict, record_dt: datetime):
+        for key in self._keys(record):
+            self._series[key].subtract(record_dt, record["amount"])
+
+    def total(self, record_type: str, category: Optional[str] = None,
+              from_dt: Optional[datetime] = None, to_dt: Optional[datetime] = None) -> float:
+        series = self._series.get((record_type, category))
+        if series is None:
+            return 0.0
+        return series.total(from_dt, to_dt)[0]
+
+    def breakdown(self, record_type: str, from_dt: Optional[datetime] = None,
+                  to_dt: Optional[datetime] = None) -> Dict[str, float]:
+        totals = {}
+        for (type_, category), series in self._series.items():
+            if type_ != record_type or category is None:
+                continue
+            amount, count = series.total(from_dt, to_dt)
+            if count:
+                totals[category] = amount
+        return totals
+
+    def diff(self, other: "RollupTable") -> List[str]:
+        """Describe every (type, category, date) slot where this table and `other` disagree."""
+        mismatches = []
+        for key in sorted(set(self._series) | set(other._series), key=str):
+            mine = self._series.get(key, _Series())
+            theirs = other._series.get(key, _Series())
+            my_slots = dict(zip(mine.dates, zip(mine.sums, mine.counts)))
+            their_slots = dict(zip(theirs.dates, zip(theirs.sums, theirs.counts)))
+            for record_dt in sorted(set(my_slots) | set(their_slots)):
+                my_amount, my_count = my_slots.get(record_dt, (0.0, 0))
+                their_amount, their_count = their_slots.get(record_dt, (0.0, 0))
+                if my_count != their_count or abs(my_amount - their_amount) > _TOLERANCE:
+                    mismatches.append(
+                        f"{key[0]}/{key[1] or '*'} on {record_dt.isoformat()}: "
+                        f"rollup has {my_amount} over {my_count} record(s), recompute has {their_amount} over {their_count}"
+                    )
+        return mismatches
@@ -1,127 +1,254 @@
 # budget_server.py
 
-import sys
-
-from mcp.server.fastmcp import FastMCP
-from budget_manager import BudgetManager
+import logging
+import os
+
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.types import ToolAnnotations
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from starlette.requests import Request
+from starlette.responses import Response
+from budget_import import resolve_file
+from budget_manager import ALLOWED_CATEGORIES, DEFAULT_PAGE_SIZE
+from budget_tenants import LedgerPool, tenant_of
 from typing import Optional
 
+logging.basicConfig(level=os.environ.get("BUDGET_LOG_LEVEL", "WARNING").upper())
+logger = logging.getLogger("budget_server")
+
 # Initialize
-budget_manager = BudgetManager()
+# One ledger per tenant; the default tenant uses budget_data.db
+ledgers = LedgerPool()
 mcp = FastMCP("Budget")
 
-@mcp.tool()
-async def add_expense(date: str, amount: float, description: str, category: str) -> str:
+
+def tenant_ledger(ctx: Context):
+    """The calling client's ledger. The tenant comes from its connection, never from tool arguments, which the model writes."""
+    return ledgers.ledger(tenant_of(ctx.request_context.request))
+
+
+# Lets clients tell which tools change the ledger, e.g. to keep them from running concurrently
+MUTATING = ToolAnnotations(readOnlyHint=False)
+# Writes a new file but never touches the ledger or an existing file
+CREATES_FILE = ToolAnnotations(readOnlyHint=False, destructiveHint=False)
+
+@mcp.tool(annotations=MUTATING)
+async def add_expense(ctx: Context, date: str, amount: float, description: str, category: str) -> str:
     """Add a new expense to the budget. Only use this when the user mentions spending money."""
-    budget_manager.add_record("expense", date, amount, description, category)
-    return "Expense recorded successfully."
+    async with tenant_ledger(ctx) as budget_manager:
+        await budget_manager.add_record("expense", date, amount, description, category)
+        return "Expense recorded successfully."
 
-@mcp.tool()
-async def add_income(date: str, amount: float, description: str, category: str) -> str:
+@mcp.tool(annotations=MUTATING)
+async def add_income(ctx: Context, date: str, amount: float, description: str, category: str) -> str:
     """Add a new income to the budget. Only use when the user mentions receiving money."""
-    budget_manager.add_record("income", date, amount, description, category)
-    return "Income recorded successfully."
+    async with tenant_ledger(ctx) as budget_manager:
+        await budget_manager.add_record("income", date, amount, description, category)
+        return "Income recorded successfully."
 
 @mcp.tool()
-async def get_expense_total(from_date: str, to_date: str) -> float:
+async def get_expense_total(ctx: Context, from_date: str, to_date: str) -> float:
     """Calculate the total amount spent between two dates. Use for questions about total expenses in a period."""
-    return budget_manager.get_total("expense", from_date, to_date)
+    async with tenant_ledger(ctx) as budget_manager:
+        return await budget_manager.get_total("expense", from_date, to_date)
 
 @mcp.tool()
-async def get_income_total(from_date: str, to_date: str) -> float:
+async def get_income_total(ctx: Context, from_date: str, to_date: str) -> float:
     """Calculate the total amount received between two dates. Use for questions about total income in a period."""
-    return budget_manager.get_total("income", from_date, to_date)
+    async with tenant_ledger(ctx) as budget_manager:
+        return await budget_manager.get_total("income", from_date, to_date)
 
 @mcp.tool()
-async def get_expenses(from_date: str, to_date: str) -> list:
-    """Retrieve a detailed list of all expenses between two dates. Use if the user asks for a breakdown or list of expenses."""
-    return budget_manager.query_records("expense", from_date, to_date)
+async def get_expenses(ctx: Context, from_date: str, to_date: str, limit: int = DEFAULT_PAGE_SIZE,
+                       cursor: Optional[str] = None, fields: Optional[list[str]] = None, sort_by: str = "date",
+                       descending: bool = False) -> dict:
+    """Retrieve a detailed list of expenses between two dates. Use if the user asks for a breakdown or list of expenses. Returns one page of at most `limit` records plus the total count; if "next_cursor" is set, pass it as `cursor` to get the next page. Use `fields` (e.g. ["date", "amount", "description"]) to get only the fields you need, and `sort_by`/`descending` to order by "date", "amount", "description" or "category"."""
+    async with tenant_ledger(ctx) as budget_manager:
+        return await budget_manager.page_records("expense", from_date, to_date, limit=limit, cursor=cursor,
+                                                 fields=fields, sort_by=sort_by, descending=descending)
 
 @mcp.tool()
-async def get_incomes(from_date: str, to_date: str) -> list:
-    """Retrieve a detailed list of all incomes between two dates. Use if the user asks for a breakdown or list of incomes."""
-    return budget_manager.query_records("income", from_date, to_date)
+async def get_incomes(ctx: Context, from_date: str, to_date: str, limit: int = DEFAULT_PAGE_SIZE,
+                      cursor: Optional[str] = None, fields: Optional[list[str]] = None, sort_by: str = "date",
+                      descending: bool = False) -> dict:
+    """Retrieve a detailed list of incomes between two dates. Use if the user asks for a breakdown or list of incomes. Returns one page of at most `limit` records plus the total count; if "next_cursor" is set, pass it as `cursor` to get the next page. Use `fields` to get only the fields you need, and `sort_by`/`descending` to order the results."""
+    async with tenant_ledger(ctx) as budget_manager:
+        return await budget_manager.page_records("income", from_date, to_date, limit=limit, cursor=cursor,
+                                                 fields=fields, sort_by=sort_by, descending=descending)
 
 @mcp.tool()
-async def get_balance(from_date: str, to_date: str) -> float:
+async def get_balance(ctx: Context, from_date: str, to_date: str) -> float:
     """Calculate net balance (income minus expenses) between two dates. Use when the user asks about profit, savings, or remaining money."""
-    return budget_manager.get_balance(from_date, to_date)
+    async with tenant_ledger(ctx) as budget_manager:
+        return await budget_manager.get_balance(from_date, to_date)
 
 @mcp.tool()
-async def get_expense_total_for_category(from_date: str, to_date: str, category: str) -> float:
+async def get_expense_total_for_category(ctx: Context, from_date: str, to_date: str, category: str) -> float:
     """Get the total amount spent in a specific category over a time period. Use when the user asks how much they spent on a category (e.g., "food") in a period."""
-    return budget_manager.get_total_for_category("expense", from_date, to_date, category)
+    async with tenant_ledger(ctx) as budget_manager:
+        return await budget_manager.get_total_for_category("expense", from_date, to_date, category)
 
 @mcp.tool()
-async def get_expense_breakdown_by_category(from_date: str, to_date: str) -> dict:
+async def get_expense_breakdown_by_category(ctx: Context, from_date: str, to_date: str) -> dict:
     """Get totals for each expense category over a time period. Use when the user asks for an overview of where their money went."""
-    return budget_manager.get_total_breakdown_by_category("expense", from_date, to_date)
+    async with tenant_ledger(ctx) as budget_manager:
+        return await budget_manager.get_total_breakdown_by_category("expense", from_date, to_date)
 
 @mcp.tool()
-async def get_income_total_for_category(from_date: str, to_date: str, category: str) -> float:
+async def get_income_total_for_category(ctx: Context, from_date: str, to_date: str, category: str) -> float:
     """Get the total income for a specific category over a time period. Use when the user asks how much income they received from a certain source (e.g., "salary")."""
-    return budget_manager.get_total_for_category("income", from_date, to_date, category)
+    async with tenant_ledger(ctx) as budget_manager:
+        return await budget_manager.get_total_for_category("income", from_date, to_date, category)
 
 @mcp.tool()
-async def get_income_breakdown_by_category(from_date: str, to_date: str) -> dict:
+async def get_income_breakdown_by_category(ctx: Context, from_date: str, to_date: str) -> dict:
     """Get totals for each income category over a time period. Use when the user asks for an overview of where their income came from."""
-    return budget_manager.get_total_breakdown_by_category("income", from_date, to_date)
+    async with tenant_ledger(ctx) as budget_manager:
+        return await budget_manager.get_total_breakdown_by_category("income", from_date, to_date)
 
 @mcp.tool()
 async def get_allowed_categories() -> list:
     """Retrieve a list of all valid categories for expenses and incomes. Use this if you need to validate or suggest a category to the user. Only categories from this list can be used to add new expenses or incomes."""
-    return budget_manager.get_allowed_categories()
+    return ALLOWED_CATEGORIES
 
-@mcp.tool()
+@mcp.tool(annotations=MUTATING)
+async def add_category_alias(ctx: Context, alias: str, category: str) -> str:
+    """Teach the budget a custom name for one of the allowed categories (e.g. "groceries" for "food"). Use when the user says a word of theirs should always mean a certain category."""
+    async with tenant_ledger(ctx) as budget_manager:
+        await budget_manager.add_category_alias(alias, category)
+        return f"'{alias}' will now be recorded as '{category}'."
+
+@mcp.tool(annotations=MUTATING)
 async def edit_record(
+    ctx: Context,
     record_id: str,
     record_type: str,
     date: str,
     amount: float,
     description: str,
-    category: str
+    category: str,
 ) -> str:
     """Edit an existing record by its index (use after finding it with find_records). Only use after confirming which record needs editing."""
-    print(f"[DEBUG] edit_record called with:", file=sys.stderr)
-    print(f"  record_id={record_id}", file=sys.stderr)
-    print(f"  record_type={record_type}, date={date}, amount={amount}, description={description}, category={category}", file=sys.stderr)
-    budget_manager.edit_record(record_id, record_type, date, amount, description, category)
-    return "Record updated successfully."
+    logger.debug("edit_record called with record_id=%s, record_type=%s, date=%s, amount=%s, description=%s, category=%s",
+                 record_id, record_type, date, amount, description, category)
+    async with tenant_ledger(ctx) as budget_manager:
+        await budget_manager.edit_record(record_id, record_type, date, amount, description, category)
+        return "Record updated successfully."
 
-@mcp.tool()
+@mcp.tool(annotations=MUTATING)
 async def delete_record(
-    record_id: str
+    ctx: Context,
+    record_id: str,
 ) -> str:
     """Delete a record by its index (use after finding it with find_records). Only use after confirming which record needs deleting."""
-    print(f"[DEBUG] delete_record called with record_id={record_id}", file=sys.stderr)
-    budget_manager.delete_record(record_id)
-    return "Record deleted successfully."
+    logger.debug("delete_record called with record_id=%s", record_id)
+    async with tenant_ledger(ctx) as budget_manager:
+        await budget_manager.delete_record(record_id)
+        return "Record deleted successfully."
 
 
 @mcp.tool()
 async def find_records(
+    ctx: Context,
     record_type: Optional[str] = None,
     from_date: Optional[str] = None,
     to_date: Optional[str] = None,
     amount: Optional[float] = None,
     description: Optional[str] = None,
     category: Optional[str] = None,
-) -> list:
-    """Search for matching records based on filters. Use this if the user describes a record they want to edit or delete."""
-    print(f"[DEBUG] find_records called with:", file=sys.stderr)
-    print(f"  record_type={record_type}, from_date={from_date}, to_date={to_date}, amount={amount}, description={description}, category={category}", file=sys.stderr)
-    results = budget_manager.find_records(
-        record_type=record_type,
-        from_date=from_date,
-        to_date=to_date,
-        amount=amount,
-        description=description,
-        category=category
-    )
-    print(f"[DEBUG] find_records returning {len(results)} result(s)", file=sys.stderr)
-    for r in results:
-        print(f"  {r}", file=sys.stderr)
-    return results
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    fields: Optional[list[str]] = None,
+    sort_by: str = "date",
+    descending: bool = False,
+) -> dict:
+    """Search for matching records based on filters. Use this if the user describes a record they want to edit or delete. Records with a "rule_id" are occurrences of a recurring rule and cannot be edited or deleted one by one; use delete_recurring for them. Returns one page of at most `limit` records plus the total count; if "next_cursor" is set, pass it as `cursor` to get the next page."""
+    logger.debug("find_records called with record_type=%s, from_date=%s, to_date=%s, amount=%s, description=%s, category=%s",
+                 record_type, from_date, to_date, amount, description, category)
+    async with tenant_ledger(ctx) as budget_manager:
+        page = await budget_manager.page_records(
+            record_type=record_type,
+            from_date=from_date,
+            to_date=to_date,
+            amount=amount,
+            description=description,
+            category=category,
+            limit=limit,
+            cursor=cursor,
+            fields=fields,
+            sort_by=sort_by,
+            descending=descending,
+        )
+        logger.debug("find_records returning %d of %d result(s)", len(page["records"]), page["total"])
+        return page
+
+@mcp.tool(annotations=MUTATING)
+async def add_records(ctx: Context, records: list[dict]) -> str:
+    """Add many expenses and/or incomes at once. Each record needs "type" ("expense" or "income"), "date", "amount", "description" and "category". Prefer this over repeated add_expense/add_income calls when the user gives several records."""
+    async with tenant_ledger(ctx) as budget_manager:
+        record_ids = await budget_manager.add_records(records)
+        return f"{len(record_ids)} record(s) recorded successfully."
+
+@mcp.tool(annotations=MUTATING)
+async def edit_records(ctx: Context, records: list[dict]) -> str:
+    """Edit many existing records at once. Each record needs its "record_id" plus the full new "type", "date", "amount", "description" and "category". Only use after confirming which records need editing."""
+    async with tenant_ledger(ctx) as budget_manager:
+        await budget_manager.edit_records(records)
+        return f"{len(records)} record(s) updated successfully."
+
+@mcp.tool(annotations=MUTATING)
+async def delete_records(ctx: Context, record_ids: list[str]) -> str:
+    """Delete many records at once by their IDs (use after finding them with find_records). Only use after confirming which records need deleting."""
+    async with tenant_ledger(ctx) as budget_manager:
+        count = await budget_manager.delete_records(record_ids)
+        return f"{count} record(s) deleted successfully."
+
+@mcp.tool(annotations=MUTATING)
+async def import_statement(ctx: Context, path: str, file_format: str = "csv", default_category: str = "other") -> dict:
+    """Import a bank statement file ("csv" or "ofx") from the given path, relative to the statements directory. Use when the user wants to load a statement instead of entering records one by one. Negative amounts become expenses and positive amounts incomes, unless the CSV has a "type" column."""
+    path = resolve_file(path)
+    async with tenant_ledger(ctx) as budget_manager:
+        return await budget_manager.import_statement(path, file_format, default_category)
+
+@mcp.tool(annotations=CREATES_FILE)
+async def export_records(ctx: Context, path: str, record_type: Optional[str] = None, from_date: Optional[str] = None, to_date: Optional[str] = None) -> str:
+    """Export records to a new CSV file at the given path, relative to the statements directory (an existing file is not overwritten), optionally only one type ("expense" or "income") and only between two dates."""
+    filename = resolve_file(path)
+    async with tenant_ledger(ctx) as budget_manager:
+        count = await budget_manager.export_records(filename, record_type, from_date, to_date)
+        return f"{count} record(s) exported to {path}."
+
+@mcp.tool(annotations=MUTATING)
+async def add_recurring(ctx: Context, record_type: str, amount: float, description: str, category: str, frequency: str,
+                        start_date: str, interval: int = 1, end_date: Optional[str] = None) -> str:
+    """Add a recurring expense or income (record_type "expense" or "income"), such as monthly rent or a salary. `frequency` is "daily", "weekly", "monthly" or "yearly", repeating every `interval` periods from `start_date` until `end_date` if given. Use instead of adding the same record again and again; its occurrences then count in every total, list and breakdown."""
+    async with tenant_ledger(ctx) as budget_manager:
+        rule_id = await budget_manager.add_recurring(record_type, amount, description, category, frequency,
+                                                     start_date, interval, end_date)
+        return f"Recurring {record_type} added with ID {rule_id}."
+
+@mcp.tool()
+async def list_recurring(ctx: Context, record_type: Optional[str] = None) -> list:
+    """List the recurring expenses and incomes with their IDs, optionally only one type ("expense" or "income")."""
+    async with tenant_ledger(ctx) as budget_manager:
+        return await budget_manager.list_recurring(record_type)
+
+@mcp.tool(annotations=MUTATING)
+async def delete_recurring(ctx: Context, rule_id: str) -> str:
+    """Stop and remove a recurring expense or income by its ID (from list_recurring). Its past occurrences disappear from the totals too."""
+    async with tenant_ledger(ctx) as budget_manager:
+        await budget_manager.delete_recurring(rule_id)
+        return "Recurring record deleted successfully."
+
+@mcp.tool()
+async def get_cash_flow_forecast(ctx: Context, from_date: str, to_date: str, history_days: int = 90) -> dict:
+    """Forecast income, expenses and net cash flow per month between two dates, usually in the future. Recurring records count exactly; other spending and income are projected from their average over the last `history_days` days. Use when the user asks how much they will have or spend later on."""
+    async with tenant_ledger(ctx) as budget_manager:
+        return await budget_manager.get_cash_flow_forecast(from_date, to_date, history_days)
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> Response:
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
 if __name__ == "__main__":
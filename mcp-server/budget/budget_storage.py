@@ -0,0 +1,288 @@
+# budget_storage.py
+
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+from budget_metrics import SAVE_DATA_SECONDS
+from budget_recurrence import RULE_FIELDS
+
+RECORD_FIELDS = ("record_id", "type", "date", "amount", "description", "category")
+
+
+class JsonStorage:
+    """Legacy backend: the whole ledger is one JSON list, rewritten on every change."""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._data: List[Dict] = []
+        self._aliases: Dict[str, str] = {}
+        self._rules: Dict[str, Dict] = {}
+        self._depth = 0
+        if not os.path.exists(self.filename):
+            with open(self.filename, 'w') as f:
+                json.dump([], f)
+        with open(self.filename, 'r') as f:
+            self._data = json.load(f)
+
+    def load_all(self) -> List[Dict]:
+        # The file is only read once; afterwards the in-memory list (including uncommitted writes) is authoritative.
+        return [dict(record) for record in self._data]
+
+    def _flush(self):
+        if self._depth:
+            return
+        # Write to a temp file in the same directory and rename over the ledger, so a crash never leaves a torn file.
+        directory = os.path.dirname(os.path.abspath(self.filename))
+        with SAVE_DATA_SECONDS.labels("json").time():
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(self._data, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.filename)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Apply every write inside the block with a single file rewrite, or none of them on error. May be nested."""
+        snapshot = list(self._data)
+        self._depth += 1
+        try:
+            yield
+        except BaseException:
+            self._depth -= 1
+            self._data = snapshot
+            raise
+        self._depth -= 1
+        try:
+            self._flush()
+        except BaseException:
+            self._data = snapshot
+            raise
+
+    def insert(self, record: Dict):
+        self._data.append(dict(record))
+        self._flush()
+
+    def update(self, record: Dict) -> bool:
+        for i, existing in enumerate(self._data):
+            if existing.get("record_id") == record["record_id"]:
+                self._data[i] = dict(record)
+                self._flush()
+                return True
+        return False
+
+    def delete(self, record_id: str) -> bool:
+        new_data = [record for record in self._data if record.get("record_id") != record_id]
+        if len(new_data) == len(self._data):
+            return False
+        self._data = new_data
+        self._flush()
+        return True
+
+    def load_aliases(self) -> Dict[str, str]:
+        return dict(self._aliases)
+
+    def save_alias(self, alias: str, category: str):
+        # The legacy file is a bare list of records, so aliases only live for this process.
+        self._aliases[alias] = category
+
+    def load_rules(self) -> List[Dict]:
+        return [dict(rule) for rule in self._rules.values()]
+
+    def save_rule(self, rule: Dict):
+        # Like aliases, recurring rules have no place in the legacy file and only live for this process.
+        self._rules[rule["rule_id"]] = dict(rule)
+
+    def delete_rule(self, rule_id: str) -> bool:
+        return self._rules.pop(rule_id, None) is not None
+
+    def close(self):
+        pass
+
+
+class SQLiteStorage:
+    """One row per record, so single-record writes cost O(log N) instead of a full file rewrite."""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        # Access is serialized by BudgetManager's lock, but reads and the batched writer run on worker threads.
+        self._conn = sqlite3.connect(self.filename, check_same_thread=False)
+        self._depth = 0
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            "record_id TEXT PRIMARY KEY, "
+            "type TEXT NOT NULL, "
+            "date TEXT NOT NULL, "
+            "amount REAL NOT NULL, "
+            "description TEXT NOT NULL, "
+            "category TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_records_type_date ON records (type, date)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS category_aliases (alias TEXT PRIMARY KEY, category TEXT NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS recurring_rules ("
+            "rule_id TEXT PRIMARY KEY, "
+            "type TEXT NOT NULL, "
+            "amount REAL NOT NULL, "
+            "description TEXT NOT NULL, "
+            "category TEXT NOT NULL, "
+            "frequency TEXT NOT NULL, "
+            "interval INTEGER NOT NULL, "
+            "start_date TEXT NOT NULL, "
+            "end_date TEXT)"
+        )
+        self._conn.commit()
+
+    def _commit(self):
+        if not self._depth:
+            with SAVE_DATA_SECONDS.labels("sqlite").time():
+                self._conn.commit()
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Commit every write inside the block at once, or roll all of them back on error.
+        Nested blocks become savepoints, so an inner failure only undoes the inner writes.
+        """
+        depth = self._depth
+        savepoint = f"sp{depth}"
+        self._conn.execute(f"SAVEPOINT {savepoint}" if depth else "BEGIN")
+        self._depth += 1
+        try:
+            yield
+            self._depth -= 1
+            if depth:
+                self._conn.execute(f"RELEASE {savepoint}")
+            else:
+                with SAVE_DATA_SECONDS.labels("sqlite").time():
+                    self._conn.commit()
+        except BaseException:
+            self._depth = depth
+            if depth:
+                self._conn.execute(f"ROLLBACK TO {savepoint}")
+                self._conn.execute(f"RELEASE {savepoint}")
+            else:
+                self._conn.rollback()
+            raise
+
+    def load_all(self) -> List[Dict]:
+        cursor = self._conn.execute(f"SELECT {', '.join(RECORD_FIELDS)} FROM records")
+        return [dict(zip(RECORD_FIELDS, row)) for row in cursor]
+
+    def insert(self, record: Dict):
+        self._conn.execute(
+            "INSERT INTO records VALUES (?, ?, ?, ?, ?, ?)",
+            tuple(record[field] for field in RECORD_FIELDS),
+        )
+        self._commit()
+
+    def update(self, record: Dict) -> bool:
+        cursor = self._conn.execute(
+            "UPDATE records SET type = ?, date = ?, amount = ?, description = ?, category = ? WHERE record_id = ?",
+            tuple(record[field] for field in RECORD_FIELDS[1:]) + (record["record_id"],),
+        )
+        self._commit()
+        return cursor.rowcount > 0
+
+    def delete(self, record_id: str) -> bool:
+        cursor = self._conn.execute("DELETE FROM records WHERE record_id = ?", (record_id,))
+        self._commit()
+        return cursor.rowcount > 0
+
+    def load_aliases(self) -> Dict[str, str]:
+        return dict(self._conn.execute("SELECT alias, category FROM category_aliases"))
+
+    def save_alias(self, alias: str, category: str):
+        self._conn.execute("INSERT OR REPLACE INTO category_aliases VALUES (?, ?)", (alias, category))
+        self._commit()
+
+    def load_rules(self) -> List[Dict]:
+        cursor = self._conn.execute(f"SELECT {', '.join(RULE_FIELDS)} FROM recurring_rules")
+        return [dict(zip(RULE_FIELDS, row)) for row in cursor]
+
+    def save_rule(self, rule: Dict):
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO recurring_rules VALUES ({', '.join('?' * len(RULE_FIELDS))})",
+            tuple(rule.get(field) for field in RULE_FIELDS),
+        )
+        self._commit()
+
+    def delete_rule(self, rule_id: str) -> bool:
+        cursor = self._conn.execute("DELETE FROM recurring_rules WHERE rule_id = ?", (rule_id,))
+        self._commit()
+        return cursor.rowcount > 0
+
+    def close(self):
+        self._conn.close()
+
+
+def open_storage(filename: str):
+    """Pick a backend from the file extension: '.json' keeps the legacy format, anything else is SQLite."""
+    if filename.endswith(".json"):
+        return JsonStorage(filename)
+    return SQLiteStorage(filename)
+
+
+def _legacy_row(record: Dict, position: int) -> tuple:
+    """A legacy JSON record as a records-table row. Only type, date, amount and category are required."""
+    missing = [field for field in ("type", "date", "amount", "category") if record.get(field) is None]
+    if missing:
+        raise ValueError(f"Record {position}: missing field(s) {', '.join(missing)}.")
+    return (record.get("record_id") or str(uuid.uuid4()), record["type"], record["date"], record["amount"],
+            record.get("description") or "", record["category"])
+
+
+def migrate_json_to_sqlite(json_filename: str, db_filename: str) -> int:
+    """
+    Copy every record from a legacy JSON ledger into a SQLite ledger. Returns the number of records copied.
+
+    A new ledger is built in a temp file and renamed into place only once every row is in, so a bad
+    legacy record leaves no half-migrated (or empty) database behind to be mistaken for a finished one.
+    """
+    with open(json_filename, 'r') as f:
+        data = json.load(f)
+    rows = [_legacy_row(record, i) for i, record in enumerate(data)]
+
+    exists = os.path.exists(db_filename)
+    if exists:
+        target = db_filename
+    else:
+        fd, target = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(db_filename)), suffix=".db.tmp")
+        os.close(fd)
+    try:
+        storage = SQLiteStorage(target)
+        try:
+            with storage._conn:
+                storage._conn.executemany("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?)", rows)
+        finally:
+            storage.close()
+        if not exists:
+            os.replace(target, db_filename)
+    except BaseException:
+        if not exists:
+            for leftover in (target, target + "-wal", target + "-shm"):
+                if os.path.exists(leftover):
+                    os.unlink(leftover)
+        raise
+    return len(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate a JSON budget ledger to SQLite.")
+    parser.add_argument("json_file")
+    parser.add_argument("db_file")
+    args = parser.parse_args()
+    count = migrate_json_to_sqlite(args.json_file, args.db_file)
+    print(f"Migrated {count} record(s) from {args.json_file} to {args.db_file}")
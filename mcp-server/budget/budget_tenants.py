@@ -0,0 +1,119 @@
+# budget_tenants.py
+
+import asyncio
+import os
+import re
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from async_budget_manager import AsyncBudgetManager
+from budget_manager import BudgetManager
+
+DEFAULT_TENANT = "default"
+# The default tenant keeps the original single ledger, so existing data stays where it is
+DEFAULT_LEDGER = os.environ.get("BUDGET_DEFAULT_LEDGER", "budget_data.db")
+LEDGER_DIR = os.environ.get("BUDGET_LEDGER_DIR", "ledgers")
+MAX_OPEN_LEDGERS = int(os.environ.get("BUDGET_MAX_OPEN_LEDGERS", "32"))
+# HTTP header a client sets on its connection to pick its tenant
+TENANT_HEADER = "X-Tenant-ID"
+
+_TENANT_ID = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+
+def tenant_of(request) -> str:
+    """The tenant of an HTTP request, from its TENANT_HEADER. Requests without one, and stdio clients, get the default tenant."""
+    headers = getattr(request, "headers", None)
+    return (headers.get(TENANT_HEADER) if headers is not None else None) or DEFAULT_TENANT
+
+
+class _Shard:
+    def __init__(self, opening: asyncio.Task):
+        self.opening = opening
+        self.users = 0
+
+
+class LedgerPool:
+    """
+    One ledger file per tenant, each behind its own AsyncBudgetManager.
+
+    Shards share nothing (lock, connection, writer task), so different tenants read and write in
+    parallel. At most `max_open` shards stay open; beyond that the least recently used idle one is
+    closed after its queued writes commit. A shard in use is never closed under its caller.
+    """
+
+    def __init__(self, directory: str = LEDGER_DIR, max_open: int = MAX_OPEN_LEDGERS, default_ledger: str = DEFAULT_LEDGER):
+        self.directory = directory
+        self.max_open = max_open
+        self.default_ledger = default_ledger
+        self._shards: "OrderedDict[str, _Shard]" = OrderedDict()
+        self._lock = asyncio.Lock()
+        self.opened = 0
+        self.evicted = 0
+
+    def filename(self, tenant_id: str) -> str:
+        if tenant_id == DEFAULT_TENANT:
+            return self.default_ledger
+        if not _TENANT_ID.match(tenant_id):
+            raise ValueError("Invalid tenant ID. Use up to 64 letters, digits, '.', '_' or '-', starting with a letter or digit.")
+        return os.path.join(self.directory, f"{tenant_id}.db")
+
+    async def _open(self, filename: str) -> AsyncBudgetManager:
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        manager = await asyncio.to_thread(BudgetManager, filename)
+        self.opened += 1
+        return AsyncBudgetManager(manager)
+
+    @asynccontextmanager
+    async def ledger(self, tenant_id: str = DEFAULT_TENANT) -> AsyncIterator[AsyncBudgetManager]:
+        """The tenant's ledger, opened on first use and kept open while the block runs."""
+        filename = self.filename(tenant_id)
+        async with self._lock:
+            shard = self._shards.get(tenant_id)
+            if shard is None:
+                shard = self._shards[tenant_id] = _Shard(asyncio.create_task(self._open(filename)))
+            self._shards.move_to_end(tenant_id)
+            shard.users += 1
+        try:
+            try:
+                manager = await asyncio.shield(shard.opening)
+            except Exception:
+                async with self._lock:
+                    if self._shards.get(tenant_id) is shard:
+                        del self._shards[tenant_id]
+                raise
+            yield manager
+        finally:
+            shard.users -= 1
+            await self._evict()
+
+    async def _evict(self):
+        closing = []
+        async with self._lock:
+            excess = len(self._shards) - self.max_open
+            for tenant_id, shard in list(self._shards.items()):
+                if excess <= 0:
+                    break
+                if shard.users or not shard.opening.done():
+                    continue
+                del self._shards[tenant_id]
+                closing.append(shard)
+                excess -= 1
+        for shard in closing:
+            self.evicted += 1
+            if shard.opening.exception() is None:
+                await shard.opening.result().aclose()
+
+    def stats(self) -> dict:
+        return {"open": len(self._shards), "max_open": self.max_open, "opened": self.opened, "evicted": self.evicted}
+
+    async def aclose(self, tenant_id: Optional[str] = None):
+        """Close one tenant's ledger, or all of them, after their queued writes commit."""
+        async with self._lock:
+            tenant_ids = [tenant_id] if tenant_id is not None else list(self._shards)
+            shards = [self._shards.pop(tid) for tid in tenant_ids if tid in self._shards]
+        for shard in shards:
+            manager = await shard.opening
+            await manager.aclose()
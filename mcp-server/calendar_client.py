@@ -0,0 +1,95 @@
+import asyncio
+import datetime
+import os
+import queue
+import threading
+
+import google_auth_httplib2
+import httplib2
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.discovery import build
+
+# Define the scope
+SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
+
+
+class CalendarClient:
+    """
+    One authenticated Calendar service per process.
+
+    Credentials are loaded once and refreshed shortly before they expire, the discovery document
+    is built once, and requests run on worker threads over a small pool of reusable HTTP
+    connections (httplib2 connections are not thread-safe, so each request borrows its own).
+    Pass `service` to run against a local fake of the Calendar API instead of Google, such as
+    benchmarks/fake_calendar.py's FakeCalendarService.
+    """
+
+    def __init__(self, token_file='token.json', credentials_file='credentials.json', service=None,
+                 pool_size=8, refresh_margin=datetime.timedelta(minutes=5), api_endpoint=None):
+        self.token_file = token_file
+        self.credentials_file = credentials_file
+        self.pool_size = pool_size
+        self.refresh_margin = refresh_margin
+        self.api_endpoint = api_endpoint or os.environ.get('CALENDAR_API_ENDPOINT')
+        self._service = service
+        self._fake = service is not None
+        self._creds = None
+        self._http_pool = None
+        self._lock = threading.Lock()
+
+    def _save_credentials(self):
+        with open(self.token_file, 'w') as token:
+            token.write(self._creds.to_json())
+
+    def _ensure_credentials(self):
+        """Load credentials on first use, then refresh them before they expire instead of after a failed call."""
+        with self._lock:
+            if self._creds is None:
+                # Token file stores the user's access and refresh tokens
+                if os.path.exists(self.token_file):
+                    self._creds = Credentials.from_authorized_user_file(self.token_file, SCOPES)
+                # If there are no valid credentials, let the user log in
+                if not self._creds or not (self._creds.valid or self._creds.refresh_token):
+                    flow = InstalledAppFlow.from_client_secrets_file(self.credentials_file, SCOPES)
+                    self._creds = flow.run_local_server(port=0)
+                    self._save_credentials()
+
+            expiry = self._creds.expiry
+            expiring = expiry is not None and expiry - datetime.datetime.utcnow() < self.refresh_margin
+            if (expiring or not self._creds.valid) and self._creds.refresh_token:
+                self._creds.refresh(Request())
+                self._save_credentials()
+            return self._creds
+
+    def service(self):
+        if self._fake:
+            return self._service
+        creds = self._ensure_credentials()
+        with self._lock:
+            if self._service is None:
+                client_options = {'api_endpoint': self.api_endpoint} if self.api_endpoint else None
+                self._service = build('calendar', 'v3', credentials=creds, cache_discovery=False,
+                                      client_options=client_options)
+                self._http_pool = queue.Queue()
+                for _ in range(self.pool_size):
+                    self._http_pool.put(google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http()))
+            return self._service
+
+    def execute(self, request):
+        """Run a prepared API request on a pooled connection. Blocking; use `run` from async code."""
+        if self._fake:
+            return request.execute()
+        self._ensure_credentials()
+        http = self._http_pool.get()
+        try:
+            return request.execute(http=http)
+        finally:
+            self._http_pool.put(http)
+
+    async def run(self, make_request):
+        """Build a request with `make_request(service)` and execute it off the event loop."""
+        def call():
+            return self.execute(make_request(self.service()))
+        return await asyncio.to_thread(call)
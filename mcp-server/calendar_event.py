@@ -1,7 +1,13 @@
 from datetime import date, time
 
+from date_parser import parse_event_time
+
 class CalendarEvent:
-    def __init__(self, event_type, event_name, start_date, start_time, end_date, end_time):
+    """A calendar event reduced to what the assistant shows. Slotted, since a range query can return thousands."""
+
+    __slots__ = ('event_type', 'event_name', 'start_date', 'start_time', 'end_date', 'end_time', 'calendar', 'start_ts')
+
+    def __init__(self, event_type, event_name, start_date, start_time, end_date, end_time, calendar=None, start_ts=None):
         """
         Initialize a CalendarEvent object.
         
@@ -12,6 +18,8 @@ class CalendarEvent:
             start_time (time): Start time of the event
             end_date (date): End date of the event
             end_time (time): End time of the event
+            calendar (str): Name of the calendar the event belongs to
+            start_ts (float): Start as seconds since the epoch, used to order events across calendars
         """
 
         self.event_type = event_type
@@ -20,6 +28,27 @@ class CalendarEvent:
         self.start_time = start_time if isinstance(start_time, time) else None
         self.end_date = end_date if isinstance(end_date, date) else None
         self.end_time = end_time if isinstance(end_time, time) else None
+        self.calendar = calendar
+        self.start_ts = start_ts
+
+    @classmethod
+    def from_api(cls, event, calendar=None):
+        """Build from a Calendar API event resource, parsing each of its timestamps once."""
+        start_date, start_time, start_ts = parse_event_time(event['start'])
+        end_date, end_time, _ = parse_event_time(event['end'])
+        return cls(event.get('kind', 'Other'), event.get('summary', 'No Title'), start_date, start_time,
+                   end_date, end_time, calendar, start_ts)
+
+    def to_dict(self):
+        """JSON-ready form with ISO dates and times; fields the event doesn't have are left out."""
+        result = {'event_name': self.event_name, 'event_type': self.event_type}
+        if self.calendar:
+            result['calendar'] = self.calendar
+        for field in ('start_date', 'start_time', 'end_date', 'end_time'):
+            value = getattr(self, field)
+            if value is not None:
+                result[field] = value.isoformat()
+        return result
     
     def __str__(self):
         """Return a string representation of the event."""
@@ -28,4 +57,4 @@ class CalendarEvent:
     def __repr__(self):
         """Return a detailed string representation of the event."""
         return f"CalendarEvent(event_type='{self.event_type}', event_name='{self.event_name}', " \
-               f"start_date={self.start_date}, end_date={self.end_date})"
\ No newline at end of file
+               f"start_date={self.start_date}, end_date={self.end_date})"
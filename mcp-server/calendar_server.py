@@ -1,51 +1,99 @@
-import os
+import asyncio
 import datetime
+import heapq
+import logging
+import os
+import time
 import pytz
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
+from googleapiclient.errors import HttpError
+from calendar_client import CalendarClient
 from calendar_event import CalendarEvent
-from date_parser import extract_date, extract_time
+from event_store import EventStore
 
 from mcp.server.fastmcp import FastMCP
+from prometheus_client import CONTENT_TYPE_LATEST, Histogram, generate_latest
+from starlette.requests import Request
+from starlette.responses import Response
 
-mcp = FastMCP("Calendar")
+mcp = FastMCP("Calendar", port=8001)
+calendar_client = CalendarClient()
+event_store = EventStore(max_staleness=float(os.environ.get("CALENDAR_CACHE_MAX_AGE", "300")))
+_sync_locks = {}
+# (fetched at, [(calendar id, calendar name)]) for the user's calendar list
+_calendar_list = (0.0, [])
+logger = logging.getLogger("calendar_server")
+
+SYNC_SECONDS = Histogram("calendar_sync_seconds", "Time to sync a calendar from the Google API", ["mode"])
+QUERY_SECONDS = Histogram("calendar_query_seconds", "Time to read a date range from the local event store",
+                          buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1))
+EVENTS_RETURNED = Histogram("calendar_events_returned", "Events returned by one get_events call",
+                            buckets=(0, 1, 5, 10, 25, 50, 100, 250, 500, 1000))
 
 @mcp.tool()
-async def get_events(start_date: str, end_date: str) -> list[CalendarEvent]:
-    """Get events from the users calendar, within the given start and end dates. This includes any meetings, all-day events, reminder, or anything that might interest the users, within the specified date range."""
-    return get_events(start_date_str=start_date, end_date_str=end_date)
-
-# Define the scope
-SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
-
-def authenticate():
-    """Authenticate the user and return the service object."""
-    creds = None
-    # Token file stores the user's access and refresh tokens
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-    # If there are no valid credentials, let the user log in
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                'credentials.json', SCOPES)
-            creds = flow.run_local_server(port=0)
-        # Save the credentials for future use
-        with open('token.json', 'w') as token:
-            token.write(creds.to_json())
-    service = build('calendar', 'v3', credentials=creds)
-    return service
-
-def get_events(start_date_str, end_date_str) -> list[CalendarEvent]:
+async def get_events(start_date: str, end_date: str) -> list[dict]:
+    """Get events from all of the users calendars, within the given start and end dates, in time order. This includes any meetings, all-day events, reminder, or anything that might interest the users, within the specified date range. Each event names the calendar it came from."""
+    events = await fetch_events(start_date_str=start_date, end_date_str=end_date)
+    return [event.to_dict() for event in events]
+
+async def list_calendars(client=calendar_client, max_age=None):
+    """Every calendar in the user's calendar list as (id, name) pairs, following all result pages. Cached like the events."""
+    global _calendar_list
+    max_age = event_store.max_staleness if max_age is None else max_age
+    fetched_at, calendars = _calendar_list
+    if calendars and time.time() - fetched_at <= max_age:
+        return calendars
+    calendars = []
+    page_token = None
+    while True:
+        params = {'pageToken': page_token} if page_token else {}
+        result = await client.run(lambda service: service.calendarList().list(**params))
+        calendars.extend((item['id'], item.get('summaryOverride') or item.get('summary', item['id']))
+                         for item in result.get('items', []) if not item.get('deleted'))
+        page_token = result.get('nextPageToken')
+        if not page_token:
+            break
+    _calendar_list = (time.time(), calendars)
+    return calendars
+
+async def sync_calendar(calendar_id='primary', client=calendar_client, store=event_store):
+    """
+    Bring the local copy of a calendar up to date, following every result page.
+    Uses the stored sync token for an incremental sync, and falls back to a full sync if Google has expired it.
+    """
+    sync_token = store.sync_token(calendar_id)
+    with SYNC_SECONDS.labels("incremental" if sync_token else "full").time():
+        await _sync_pages(calendar_id, client, store, sync_token)
+
+async def _sync_pages(calendar_id, client, store, sync_token):
+    items = []
+    page_token = None
+    while True:
+        params = {'calendarId': calendar_id, 'singleEvents': True, 'maxResults': 2500}
+        if page_token:
+            params['pageToken'] = page_token
+        if sync_token:
+            params['syncToken'] = sync_token
+        try:
+            result = await client.run(lambda service: service.events().list(**params))
+        except HttpError as e:
+            if e.resp.status != 410 or not sync_token:
+                raise
+            await asyncio.to_thread(store.reset, calendar_id)
+            sync_token, items, page_token = None, [], None
+            continue
+        items.extend(result.get('items', []))
+        page_token = result.get('nextPageToken')
+        if not page_token:
+            break
+    await asyncio.to_thread(store.apply, calendar_id, items, result.get('nextSyncToken'), sync_token is None)
+
+async def fetch_events(start_date_str, end_date_str, client=calendar_client, store=event_store,
+                       calendars=None) -> list[CalendarEvent]:
     """
-    Retrieve events between start_date and end_date.
-    Dates should be in 'YYYY-MM-DD' format.
+    Retrieve events between start_date and end_date from every calendar, merged in start-time order.
+    Dates should be in 'YYYY-MM-DD' format. `calendars` is a list of (id, name) pairs; by default
+    the user's whole calendar list.
     """
-    service = authenticate()
 
     # Parse the input dates
     start_date = datetime.datetime.strptime(start_date_str, '%Y-%m-%d')
@@ -53,30 +101,45 @@ def get_events(start_date_str, end_date_str) -> list[CalendarEvent]:
 
     # Set timezone to UTC
     timezone = pytz.UTC
-    time_min = timezone.localize(start_date).isoformat()
+    time_min = timezone.localize(start_date)
     # Add one day to include events on the end_date
-    time_max = timezone.localize(end_date + datetime.timedelta(days=1)).isoformat()
-
-    events_result = service.events().list(
-        calendarId='primary',
-        timeMin=time_min,
-        timeMax=time_max,
-        singleEvents=True,
-        orderBy='startTime'
-    ).execute()
-    events = events_result.get('items', [])
-
-    calendar_events = [
-        CalendarEvent(
-            event_name=event.get('summary', 'No Title'),
-            event_type=event.get('kind', 'Other'),
-            start_date=extract_date(event['start']),
-            start_time=extract_time(event['start']),
-            end_date=extract_date(event['end']),
-            end_time=extract_time(event['end'])
-        ) for event in events]
-
-    return calendar_events
+    time_max = timezone.localize(end_date + datetime.timedelta(days=1))
+
+    if calendars is None:
+        calendars = await list_calendars(client)
+
+    # Each calendar syncs and queries concurrently; one that fails is left out rather than failing the whole answer
+    results = await asyncio.gather(
+        *(calendar_events(calendar_id, name, time_min, time_max, client, store) for calendar_id, name in calendars),
+        return_exceptions=True)
+    per_calendar = []
+    for (calendar_id, _), result in zip(calendars, results):
+        if isinstance(result, BaseException):
+            if len(calendars) == 1:
+                raise result
+            logger.warning("Skipping calendar %s: %r", calendar_id, result)
+            continue
+        per_calendar.append(result)
+
+    # Every calendar's events are already ordered by start time
+    merged = list(heapq.merge(*per_calendar, key=lambda event: event.start_ts))
+    EVENTS_RETURNED.observe(len(merged))
+    return merged
+
+async def calendar_events(calendar_id, name, time_min, time_max, client=calendar_client, store=event_store):
+    """One calendar's events in [time_min, time_max), ordered by start time, syncing first if the local copy is stale."""
+    # Only hit the network when the local copy is older than the staleness window
+    lock = _sync_locks.setdefault(calendar_id, asyncio.Lock())
+    async with lock:
+        if store.is_stale(calendar_id):
+            await sync_calendar(calendar_id, client, store)
+    with QUERY_SECONDS.time():
+        events = await asyncio.to_thread(store.query, calendar_id, time_min, time_max)
+    return [CalendarEvent.from_api(event, name) for event in events]
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> Response:
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 if __name__ == "__main__":
     mcp.run(transport="sse")
@@ -1,15 +1,22 @@
-from datetime import datetime
+from datetime import date, datetime, timezone
 
-def extract_date(date_dict):
-    date_str = date_dict.get('dateTime', date_dict.get('date'))
+def parse_event_time(date_dict):
+    """
+    Parse an API start/end object once. Returns (date, time, timestamp); time is None for all-day
+    events, whose timestamp counts from midnight UTC.
+    """
+    date_str = date_dict.get('dateTime')
+    if date_str:
+        moment = datetime.fromisoformat(date_str)
+        return moment.date(), moment.time(), moment.timestamp()
+    date_str = date_dict.get('date')
     if date_str:
-        return datetime.fromisoformat(date_str).date()
-    else:
-        return None
+        day = date.fromisoformat(date_str)
+        return day, None, datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp()
+    return None, None, None
+
+def extract_date(date_dict):
+    return parse_event_time(date_dict)[0]
 
 def extract_time(date_dict):
-    date_str = date_dict.get('dateTime', '')
-    if date_str:
-        return datetime.fromisoformat(date_str).time()
-    else:
-        return None
\ No newline at end of file
+    return parse_event_time(date_dict)[1]
@@ -0,0 +1,106 @@
+import json
+import sqlite3
+import threading
+import time
+
+from date_parser import parse_event_time
+
+
+def event_timestamp(date_dict):
+    """Seconds since the epoch for an event's start or end. All-day dates count from midnight UTC."""
+    return parse_event_time(date_dict)[2]
+
+
+class EventStore:
+    """
+    Local SQLite copy of calendar events, kept current by incremental sync.
+
+    Each row holds the event's start and end as timestamps; range lookups use the start index,
+    bounded below by the calendar's longest event so overlapping events are found without a full scan.
+    """
+
+    def __init__(self, filename='calendar_cache.db', max_staleness=300.0):
+        self.filename = filename
+        self.max_staleness = max_staleness
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.filename, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "calendar_id TEXT NOT NULL, "
+            "event_id TEXT NOT NULL, "
+            "start_ts REAL NOT NULL, "
+            "end_ts REAL NOT NULL, "
+            "payload TEXT NOT NULL, "
+            "PRIMARY KEY (calendar_id, event_id))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_events_start ON events (calendar_id, start_ts)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sync_state ("
+            "calendar_id TEXT PRIMARY KEY, "
+            "sync_token TEXT, "
+            "synced_at REAL NOT NULL, "
+            "max_duration REAL NOT NULL DEFAULT 0)"
+        )
+        self._conn.commit()
+
+    def _state(self, calendar_id):
+        return self._conn.execute(
+            "SELECT sync_token, synced_at, max_duration FROM sync_state WHERE calendar_id = ?", (calendar_id,)
+        ).fetchone()
+
+    def sync_token(self, calendar_id):
+        with self._lock:
+            state = self._state(calendar_id)
+        return state[0] if state else None
+
+    def is_stale(self, calendar_id):
+        with self._lock:
+            state = self._state(calendar_id)
+        return state is None or time.time() - state[1] > self.max_staleness
+
+    def apply(self, calendar_id, items, sync_token, full):
+        """Store one sync's results. A full sync replaces the calendar; an incremental one upserts and drops cancelled events."""
+        with self._lock, self._conn:
+            if full:
+                self._conn.execute("DELETE FROM events WHERE calendar_id = ?", (calendar_id,))
+            for event in items:
+                if event.get('status') == 'cancelled':
+                    self._conn.execute("DELETE FROM events WHERE calendar_id = ? AND event_id = ?",
+                                       (calendar_id, event['id']))
+                    continue
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?)",
+                    (calendar_id, event['id'], event_timestamp(event['start']), event_timestamp(event['end']),
+                     json.dumps(event)),
+                )
+            max_duration = self._conn.execute(
+                "SELECT COALESCE(MAX(end_ts - start_ts), 0) FROM events WHERE calendar_id = ?", (calendar_id,)
+            ).fetchone()[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)",
+                (calendar_id, sync_token, time.time(), max_duration),
+            )
+
+    def reset(self, calendar_id):
+        """Forget a calendar, e.g. after Google rejects its sync token, so the next sync is a full one."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM events WHERE calendar_id = ?", (calendar_id,))
+            self._conn.execute("DELETE FROM sync_state WHERE calendar_id = ?", (calendar_id,))
+
+    def query(self, calendar_id, time_min, time_max):
+        """Events overlapping [time_min, time_max), ordered by start time. Bounds are timezone-aware datetimes."""
+        min_ts = time_min.timestamp()
+        max_ts = time_max.timestamp()
+        with self._lock:
+            state = self._state(calendar_id)
+            max_duration = state[2] if state else 0
+            rows = self._conn.execute(
+                "SELECT payload FROM events WHERE calendar_id = ? AND start_ts >= ? AND start_ts < ? "
+                "AND (end_ts > ? OR start_ts >= ?) ORDER BY start_ts",
+                (calendar_id, min_ts - max_duration, max_ts, min_ts, min_ts),
+            ).fetchall()
+        return [json.loads(payload) for (payload,) in rows]
+
+    def close(self):
+        self._conn.close()
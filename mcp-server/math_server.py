@@ -1,6 +1,6 @@
 from mcp.server.fastmcp import FastMCP
 
-mcp = FastMCP("Math")
+mcp = FastMCP("Math", port=8002)
 
 @mcp.tool()
 async def add(a: int, b: int) -> int: